@@ -48,7 +48,7 @@ def run_migrations_offline() -> None:
         dialect_opts={"paramstyle": "named"},
     )
     with context.begin_transaction():
-        context.run_migration()
+        context.run_migrations()
 
 def run_migrations_online() -> None:
     """Run migrations in 'online' mode.
@@ -61,11 +61,16 @@ def run_migrations_online() -> None:
         poolclass=pool.NullPool,
     )
     with connectable.connect() as connection:
+        # `transaction_per_migration=False` (the default, made explicit here) runs every
+        # pending migration inside one transaction, so a long chain of ALTER TABLEs is
+        # committed once instead of once per revision.
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            transaction_per_migration=False,
         )
         with context.begin_transaction():
-            context.run_migration()
+            context.run_migrations()
 
 # Determine whether to run in online or offline mode and execute the migration.
 if context.is_offline_mode():
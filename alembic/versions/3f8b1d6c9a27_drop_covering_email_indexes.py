@@ -0,0 +1,40 @@
+"""Replace the covering email indexes with plain unique indexes
+
+Revision ID: 3f8b1d6c9a27
+Revises: 7d3a5f1c8e42
+Create Date: 2026-10-14 16:05:31.402917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f8b1d6c9a27'
+down_revision: Union[str, Sequence[str], None] = '7d3a5f1c8e42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Logins now find the user through the email directory's primary key, so the email
+# index on each user table only has to enforce uniqueness. Carrying `hashed_password`
+# in it just made every password change write the index as well.
+USER_TABLES = ['student', 'mentor', 'employer']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in USER_TABLES:
+        op.create_index(op.f(f'ix_{table}_email'), table, ['email'], unique=True)
+        op.drop_index(f'ix_{table}_email_cover', table_name=table)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in USER_TABLES:
+        op.create_index(
+            f'ix_{table}_email_cover', table, ['email'],
+            unique=True, postgresql_include=['hashed_password', 'id']
+        )
+        op.drop_index(op.f(f'ix_{table}_email'), table_name=table)
@@ -0,0 +1,40 @@
+"""Add covering email indexes to user tables
+
+Revision ID: 4c1e9a7b2d3f
+Revises: dbf245d1470e
+Create Date: 2026-10-14 09:12:40.118302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c1e9a7b2d3f'
+down_revision: Union[str, Sequence[str], None] = 'dbf245d1470e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The user tables whose login lookup by email is served by a covering index.
+USER_TABLES = ['student', 'mentor', 'employer']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in USER_TABLES:
+        # The covering index also enforces uniqueness, so the old
+        # single-column unique index is no longer needed.
+        op.create_index(
+            f'ix_{table}_email_cover', table, ['email'],
+            unique=True, postgresql_include=['hashed_password', 'id']
+        )
+        op.drop_index(f'ix_{table}_email', table_name=table, if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in USER_TABLES:
+        op.create_index(f'ix_{table}_email', table, ['email'], unique=True)
+        op.drop_index(f'ix_{table}_email_cover', table_name=table)
@@ -0,0 +1,28 @@
+"""Index placement.employer_id for the placements report
+
+Revision ID: 7d3a5f1c8e42
+Revises: e57a3c9d1b60
+Create Date: 2026-10-14 13:42:08.114527
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d3a5f1c8e42'
+down_revision: Union[str, Sequence[str], None] = 'e57a3c9d1b60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_placement_employer_id'), 'placement', ['employer_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_placement_employer_id'), table_name='placement')
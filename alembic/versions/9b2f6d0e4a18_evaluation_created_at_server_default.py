@@ -0,0 +1,40 @@
+"""Set a server default on evaluation.created_at
+
+Revision ID: 9b2f6d0e4a18
+Revises: 4c1e9a7b2d3f
+Create Date: 2026-10-14 10:03:27.540961
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b2f6d0e4a18'
+down_revision: Union[str, Sequence[str], None] = '4c1e9a7b2d3f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.alter_column(
+        'evaluation', 'created_at',
+        existing_type=sa.DateTime(),
+        type_=sa.DateTime(timezone=True),
+        server_default=sa.func.now(),
+        existing_nullable=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column(
+        'evaluation', 'created_at',
+        existing_type=sa.DateTime(timezone=True),
+        type_=sa.DateTime(),
+        server_default=None,
+        existing_nullable=False,
+    )
@@ -0,0 +1,58 @@
+"""Add the email directory used to route logins
+
+Revision ID: e57a3c9d1b60
+Revises: 9b2f6d0e4a18
+Create Date: 2026-10-14 11:26:51.809354
+
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e57a3c9d1b60'
+down_revision: Union[str, Sequence[str], None] = '9b2f6d0e4a18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+# The user tables, keyed by the role recorded for them in the directory.
+USER_TABLES_BY_ROLE = {'student': 'student', 'mentor': 'mentor', 'employer': 'employer'}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('emaildirectory',
+    sa.Column('email', sa.String(), nullable=False),
+    sa.Column('role', sa.String(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('email')
+    )
+    # Backfill the directory from the existing accounts so they can still log in.
+    # An email used by accounts of several roles can only be listed once, so the
+    # first role in USER_TABLES_BY_ROLE keeps it instead of the primary key aborting
+    # the migration; the duplicates are reported below.
+    for role, table in USER_TABLES_BY_ROLE.items():
+        op.execute(
+            f"INSERT INTO emaildirectory (email, role, user_id) "
+            f"SELECT email, '{role}', id FROM {table} "
+            f"WHERE NOT EXISTS (SELECT 1 FROM emaildirectory d WHERE d.email = {table}.email)"
+        )
+    all_emails = " UNION ALL ".join(f"SELECT email FROM {table}" for table in USER_TABLES_BY_ROLE.values())
+    duplicates = op.get_bind().execute(sa.text(
+        f"SELECT email FROM ({all_emails}) AS emails GROUP BY email HAVING count(*) > 1"
+    )).scalars().all()
+    if duplicates:
+        logger.warning(
+            "These emails belong to accounts of more than one role; only the first role "
+            "can log in with them: %s", ", ".join(sorted(duplicates))
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('emaildirectory')
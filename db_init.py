@@ -5,10 +5,13 @@ import sys
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy_utils import database_exists, create_database
-# We're importing Base from the data models file. This file will be created later.
-# Base contains the metadata for all your SQLModel tables.
-from src.data_models import Base
-from src.database import DATABASE_URL, engine
+from sqlmodel import SQLModel
+# Importing the data models registers every table on SQLModel's metadata.
+from src import data_models
+from src.config import get_settings
+from src.database import engine
+
+DATABASE_URL = get_settings().database_url
 
 # This script will wait for the database to be available and then
 # create all the tables defined in data_models.py.
@@ -57,15 +60,14 @@ def create_user_and_database(url: str):
     postgres_url = url.replace('youruser', 'postgres').replace('yourdbname', 'postgres')
     temp_engine = create_engine(postgres_url)
     try:
-        with temp_engine.connect() as conn:
-            # The 'AUTOCOMMIT' isolation level is necessary for DDL statements like CREATE USER.
-            conn.execution_options(isolation_level="AUTOCOMMIT").execute(
-                text("CREATE USER youruser WITH PASSWORD 'yourpassword';")
-            )
+        # The 'AUTOCOMMIT' isolation level is necessary for DDL statements like CREATE USER.
+        # It is set once for the whole connection rather than once per statement.
+        # The two statements are still sent separately: PostgreSQL runs a multi-statement
+        # string inside an implicit transaction, which CREATE DATABASE refuses to run in.
+        with temp_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("CREATE USER youruser WITH PASSWORD 'yourpassword';"))
             print("Created user 'youruser'.")
-            conn.execution_options(isolation_level="AUTOCOMMIT").execute(
-                text("CREATE DATABASE yourdbname OWNER youruser;")
-            )
+            conn.execute(text("CREATE DATABASE yourdbname OWNER youruser;"))
             print("Created database 'yourdbname' owned by 'youruser'.")
     except Exception as e:
         # User or database may already exist. This is expected and fine.
@@ -81,13 +83,22 @@ if __name__ == "__main__":
     create_user_and_database(DATABASE_URL)
     
     # Now that the user and database exist, check if our application database has been created.
-    if not database_exists(engine.url):
+    database_is_new = not database_exists(engine.url)
+    if database_is_new:
         create_database(engine.url)
         print("Database did not exist, created new one.")
     else:
         print("Database already exists.")
     
-    # Create all tables defined in Base. This is the main goal of the script.
+    # Create all tables defined in the data models. This is the main goal of the script.
+    # Every CREATE TABLE runs inside one transaction, so the schema is either created
+    # completely or not at all, and is committed once.
     print("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        if get_settings().db_init_async_commit:
+            # Don't wait for the WAL to reach disk on commit. Only worth it for
+            # throwaway development databases.
+            conn.exec_driver_sql("SET LOCAL synchronous_commit = off")
+        # A brand-new database has no tables, so the per-table existence checks can be skipped.
+        SQLModel.metadata.create_all(conn, checkfirst=not database_is_new)
     print("Tables created successfully.")
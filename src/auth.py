@@ -1,25 +1,63 @@
 # This file manages user authentication, including password hashing, token creation, and token validation.
 
-from datetime import datetime, timedelta, timezone
+import base64
+import heapq
+import hmac
+import json
+import secrets
+import threading
+import time
+from datetime import timedelta
+from functools import lru_cache
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+import jwt
+from jwt import InvalidTokenError as JWTError
 from pydantic import BaseModel
 
-# Context for securely hashing passwords using a recommended algorithm.
-# The 'sha256_crypt' scheme is a strong choice. 'deprecated="auto"' automatically
-# switches to a newer scheme if one becomes available in a future library version.
-pwd_context = CryptContext(schemes=["sha256_crypt"], deprecated="auto")
+# Passwords are hashed by the `utils` module, so every router shares one implementation.
+# The functions are re-exported here for the modules that import them from `auth`.
+from .utils import (
+    DUMMY_HASH,
+    get_password_hash,
+    hash_password_async as get_password_hash_async,
+    verify_and_update_password,
+    verify_and_update_password_async,
+    verify_password,
+)
 
 # SECURITY WARNING: In a production environment, this secret key should be
 # stored in a secure environment variable, not hardcoded.
 SECRET_KEY = "your-secret-key"
 ALGORITHM = "HS256"
+# The signing key as bytes, encoded once here rather than on every encode/decode call.
+_SECRET_KEY_BYTES = SECRET_KEY.encode()
+# Tokens always share the same JOSE header, so it is serialised and base64url-encoded once.
+# `create_access_token` signs tokens itself and only supports HS256; PyJWT still decodes them.
+_HEADER_B64 = base64.urlsafe_b64encode(b'{"alg":"HS256","typ":"JWT"}').rstrip(b"=")
+# Claims every access token must carry; tokens missing any of them are rejected by PyJWT
+# before the payload is handed back to us.
+_REQUIRED_CLAIMS = {"require": ["sub", "exp", "jti"]}
 # Define the expiration time for access tokens in minutes.
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Maximum number of decoded tokens kept in memory by `_decode_token`.
+TOKEN_CACHE_SIZE = 10000
+
+# Tokens are self-contained: the signed payload carries the subject, so any worker
+# process can validate a token, including after a restart. The only server-side state
+# is this deny-list of tokens revoked by logging out, keyed by their token ID (`jti`
+# claim) and holding the token's expiry time. Revocations only need to be kept until
+# the token would have expired anyway.
+# The deny-list is kept in this process's memory, so a logout is only enforced by the
+# worker that handled it, and is forgotten on restart.
+_revoked: dict[str, int] = {}
+# A min-heap of (expiry time, token ID) for every revocation, so that revocations of
+# expired tokens can be pruned from the oldest end without scanning the whole list.
+_revoked_expiries: list[tuple[int, str]] = []
+_revoked_lock = threading.Lock()
+
 # This class defines a FastAPI dependency that handles extracting the
 # bearer token from the 'Authorization' header in incoming requests.
 # The `tokenUrl` points to the endpoint that will issue the token.
@@ -32,38 +70,71 @@ class TokenData(BaseModel):
     """
     email: Optional[str] = None
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+def create_access_token(sub: str, expires_delta: Optional[timedelta] = None) -> str:
     """
-    Verifies a plain-text password against a hashed one.
+    Generates a new JWT access token for the subject (`sub`, typically the user's email).
+    The token also holds a random token ID (`jti`), which logging out revokes,
+    and an expiration time (`exp`).
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    # 'exp' is a NumericDate (seconds since the epoch), so it is computed directly from
+    # time.time() instead of building timezone-aware datetime objects.
+    if expires_delta:
+        lifetime = int(expires_delta.total_seconds())
+    else:
+        lifetime = ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    now = int(time.time())
+    expires_at = now + lifetime
+    token_id = secrets.token_urlsafe(16)
+    # Every token has the same three claims, so the JWT is assembled directly: only the
+    # subject goes through the JSON encoder (`token_urlsafe` output never needs escaping)
+    # and the payload is signed with a one-shot HMAC-SHA256, skipping PyJWT's generic
+    # encode path.
+    payload = f'{{"sub":{json.dumps(sub)},"jti":"{token_id}","exp":{expires_at}}}'.encode()
+    signing_input = _HEADER_B64 + b"." + base64.urlsafe_b64encode(payload).rstrip(b"=")
+    signature = hmac.digest(_SECRET_KEY_BYTES, signing_input, "sha256")
+    encoded_jwt = signing_input + b"." + base64.urlsafe_b64encode(signature).rstrip(b"=")
+    return encoded_jwt.decode()
 
-def get_password_hash(password: str) -> str:
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def _decode_token(token: str) -> tuple[str, str, int]:
     """
-    Creates a secure hash of a password for storage.
+    Verifies a JWT and returns its subject (`sub`), token ID (`jti`) and expiry (`exp`).
+    Results are memoised, so a token presented repeatedly is only verified and parsed once.
+    Invalid tokens raise `JWTError` and are never cached.
     """
-    return pwd_context.hash(password)
+    # Decode the token using the secret key and algorithm. PyJWT also checks that
+    # the 'sub', 'jti' and 'exp' claims are present and that the token has not expired.
+    payload = jwt.decode(token, _SECRET_KEY_BYTES, algorithms=[ALGORITHM], options=_REQUIRED_CLAIMS)
+    return payload["sub"], payload["jti"], payload["exp"]
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+def revoke_token(token: str) -> None:
     """
-    Generates a new JWT access token.
-    It includes a subject (`sub`) and an expiration time (`exp`).
-    The subject is typically the user's unique identifier (e.g., email).
+    Adds a token to the deny-list, so that `get_current_user` rejects it from now on,
+    even while its decoded form is still cached.
     """
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
-    else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    try:
+        _, token_id, expires_at = _decode_token(token)
+    except JWTError:
+        # An invalid token can't be used anyway, so there is nothing to revoke.
+        return
+    now = time.time()
+    with _revoked_lock:
+        # Forget revocations of tokens that have expired since, so the deny-list only
+        # holds tokens that could still be used. Only the expired entries at the top of
+        # the heap are visited, so this costs O(log n) amortised.
+        while _revoked_expiries and _revoked_expiries[0][0] <= now:
+            _, expired_id = heapq.heappop(_revoked_expiries)
+            _revoked.pop(expired_id, None)
+        _revoked[token_id] = expires_at
+        heapq.heappush(_revoked_expiries, (expires_at, token_id))
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
+async def get_current_user(token: str = Depends(oauth2_scheme)):
     """
     A FastAPI dependency that validates the JWT from the request header.
-    It decodes the token, checks for a valid user email, and handles
+    It decodes the token, checks that it hasn't been revoked, and handles
     potential JWT decoding errors by raising an HTTPException.
+    It does no blocking I/O, so it is `async` to run on the event loop
+    instead of taking a threadpool worker for every authenticated request.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -71,14 +142,14 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        # Decode the token using the secret key and algorithm
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        # Extract the user's email from the payload's 'sub' field
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        token_data = TokenData(email=email)
+        email, token_id, expires_at = _decode_token(token)
     except JWTError:
         # If the token is invalid or expired, raise the authentication exception
         raise credentials_exception
-    return token_data
+    if token_id in _revoked:
+        # The user has logged out with this token.
+        raise credentials_exception
+    # A cached decode can outlive its token, so the expiry is re-checked on every request.
+    if expires_at <= time.time():
+        raise credentials_exception
+    return TokenData(email=email)
@@ -0,0 +1,151 @@
+# Objectives:
+# This file provides an in-process cache for the responses of read-only (GET) endpoints.
+# - `cached(namespace, response_model)` is a decorator that stores a handler's response for
+#   a limited time, keyed by the handler's path and query parameters.
+# - `invalidates(*namespaces)` is a decorator for write (POST/PATCH/DELETE) handlers that
+#   clears the cached responses of every namespace the write can change.
+#
+# Each worker process keeps its own cache, so the time-to-live is also an upper bound on
+# how stale a response served by another worker can be.
+
+import functools
+import inspect
+import threading
+import time
+from typing import Any, Callable, Hashable
+
+from pydantic import TypeAdapter
+
+from .config import get_settings
+
+settings = get_settings()
+
+# Only simple path and query parameters are used to build the cache key.
+# Dependencies such as the database session are skipped.
+_KEY_TYPES = (int, float, str, bool, type(None))
+
+class ResponseCache:
+    """
+    A small TTL cache, split into namespaces that can be cleared independently.
+    The cached handlers run on the event loop, but `invalidates` also wraps sync
+    handlers, which FastAPI runs in its threadpool, so every access is guarded by a lock.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: dict[tuple[str, Hashable], tuple[float, Any]] = {}
+        # Bumped on every invalidation, so a read that started before a write
+        # doesn't store the response it computed from the old data.
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def generation(self, namespace: str) -> int:
+        with self._lock:
+            return self._generations.get(namespace, 0)
+
+    def get(self, namespace: str, key: Hashable) -> tuple[bool, Any]:
+        """
+        Returns `(True, value)` for a fresh entry and `(False, None)` otherwise.
+        """
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[(namespace, key)]
+                return False, None
+            return True, value
+
+    def set(
+        self, namespace: str, key: Hashable, value: Any, generation: int,
+        ttl_seconds: float | None = None
+    ) -> None:
+        """
+        Stores `value` unless `namespace` was invalidated since `generation` was read.
+        `ttl_seconds` overrides the cache-wide TTL for this entry.
+        """
+        if ttl_seconds is None:
+            ttl_seconds = self.ttl_seconds
+        with self._lock:
+            if self._generations.get(namespace, 0) != generation:
+                return
+            if len(self._entries) >= self.max_entries:
+                # Dicts keep insertion order, so this evicts the oldest entry.
+                del self._entries[next(iter(self._entries))]
+            self._entries[(namespace, key)] = (time.monotonic() + ttl_seconds, value)
+
+    def invalidate(self, *namespaces: str) -> None:
+        with self._lock:
+            for namespace in namespaces:
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            self._entries = {
+                key: entry for key, entry in self._entries.items() if key[0] not in namespaces
+            }
+
+response_cache = ResponseCache(
+    ttl_seconds=settings.response_cache_ttl_seconds,
+    max_entries=settings.response_cache_max_entries,
+)
+
+def _cache_key(kwargs: dict[str, Any]) -> tuple:
+    return tuple(sorted(
+        (name, value) for name, value in kwargs.items() if isinstance(value, _KEY_TYPES)
+    ))
+
+def cached(namespace: str, response_model: Any, ttl_seconds: float | None = None) -> Callable:
+    """
+    Caches the JSON-compatible form of an `async` handler's response under `namespace`.
+    The response is first filtered through `response_model` (normally the route's own
+    `response_model`), so only the fields the client would receive are kept: an ORM
+    row's `hashed_password` never ends up in the cache, and later requests don't depend
+    on the database session of the request that filled it.
+    `ttl_seconds` overrides the cache-wide TTL; caching is skipped entirely when the
+    TTL is 0.
+    """
+    ttl = response_cache.ttl_seconds if ttl_seconds is None else ttl_seconds
+    # Built once per decorated handler, since creating an adapter compiles a validator.
+    adapter = TypeAdapter(response_model)
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if ttl <= 0:
+                return await func(*args, **kwargs)
+            key = (func.__name__, _cache_key(kwargs))
+            hit, value = response_cache.get(namespace, key)
+            if hit:
+                return value
+            generation = response_cache.generation(namespace)
+            result = await func(*args, **kwargs)
+            value = adapter.dump_python(
+                adapter.validate_python(result, from_attributes=True), mode="json"
+            )
+            response_cache.set(namespace, key, value, generation, ttl_seconds=ttl)
+            return value
+        return wrapper
+    return decorator
+
+def invalidates(*namespaces: str) -> Callable:
+    """
+    Clears the cached responses of `namespaces` after the decorated write handler
+    succeeds. Works with both `async` and sync handlers; a handler that raises
+    (for example with a 404) leaves the cache untouched.
+    """
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                result = await func(*args, **kwargs)
+                response_cache.invalidate(*namespaces)
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            result = func(*args, **kwargs)
+            response_cache.invalidate(*namespaces)
+            return result
+        return wrapper
+    return decorator
@@ -1,37 +1,112 @@
 # This file manages application settings by loading them from environment variables
-# using the pydantic-settings and python-decouple libraries.
+# (and the .env file) using the pydantic-settings library.
 
-from pydantic_settings import BaseSettings
-from decouple import config
+from functools import lru_cache
+from typing import Optional
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     """
     Pydantic settings class that loads configuration from environment variables.
     This approach is a best practice for separating configuration from code.
+    Field names are matched to environment variables case-insensitively,
+    so `postgres_user` is read from `POSTGRES_USER`.
     """
-    # The database connection URL. 'config()' looks for 'DATABASE_URL' in the
-    # environment, typically in a .env file.
-    database_url: str = config('DATABASE_URL')
-    
+    # Whether the application is running against the SQLite test database.
+    testing: bool = False
+    # Lets the SQLite database skip the fsync on every commit. Only the test suite
+    # turns this on: `./test.db` persists between runs and is also what the app uses
+    # when TESTING is set, so by default it keeps SQLite's durable settings.
+    sqlite_unsafe_fast_writes: bool = False
+
+    # Logs every SQL statement. Useful while debugging, but far too expensive to leave on.
+    sql_echo: bool = False
+
+    # Statements slower than this many milliseconds are logged as warnings,
+    # even when `sql_echo` is off.
+    slow_query_threshold_ms: float = 500
+
+    # The database connection URL, typically defined in the .env file.
+    database_url: Optional[str] = None
+
+    # Connection details for the PostgreSQL database. These are only required
+    # when the application is not running in testing mode.
+    postgres_user: Optional[str] = None
+    postgres_password: Optional[str] = None
+    # The `db` default is the name of the database service in docker-compose.yml.
+    postgres_host: str = "db"
+    postgres_port: int = 5432
+    postgres_db: Optional[str] = None
+
+    # Connection pool tuning for the asynchronous PostgreSQL engine, which serves every
+    # route. Keep pool size plus overflow, summed over all workers, below the server's
+    # `max_connections`.
+    db_pool_size: int = 20
+    db_max_overflow: int = 10
+    # The sync engine only runs startup work, scripts and the `get_db` dependency,
+    # so a few connections are enough.
+    db_sync_pool_size: int = 5
+    db_sync_max_overflow: int = 5
+    # Seconds a request waits for a free connection before failing.
+    db_pool_timeout: float = 30
+    # Disable when PgBouncer sits in front of the database.
+    db_pool_pre_ping: bool = True
+
+    # How many compiled SQL statements SQLAlchemy keeps per engine, so a query
+    # is only compiled to SQL the first time it runs.
+    db_query_cache_size: int = 1024
+    # How many prepared statements asyncpg keeps per connection. Set to 0 when
+    # PgBouncer runs in transaction pooling mode, which can't share them.
+    db_statement_cache_size: int = 1024
+
+    # Lets db_init.py commit the schema without waiting for the write-ahead log to be
+    # flushed to disk. Only meant for throwaway development databases.
+    db_init_async_commit: bool = False
+
+    # How long GET responses are served from the in-process response cache, and how
+    # many responses it holds. A TTL of 0 disables the cache.
+    response_cache_ttl_seconds: float = 300
+    response_cache_max_entries: int = 1024
+    # Reports aggregate whole tables and are polled by dashboards, so they are kept
+    # for a shorter time than the other cached responses.
+    report_cache_ttl_seconds: float = 60
+
+    # The most students one POST /students/bulk request may create. Every student costs
+    # a password hash on the pool that logins also use, so larger imports are split
+    # into several requests.
+    students_bulk_max_size: int = 500
+
+    # The Argon2id cost of new password hashes: passes over memory, and memory in KiB.
+    # Hashes made with other costs still verify and are upgraded on the next login.
+    # Never lower these in production.
+    password_hash_time_cost: int = 2
+    password_hash_memory_cost_kib: int = 19456
+
     # The expiration time for JWT access tokens in minutes.
     access_token_expire_minutes: int = 30
     
     # The secret key used for signing JWTs. This is loaded from the environment
     # to keep it secure and out of the source code.
-    secret_key: str = config('SECRET_KEY')
+    secret_key: str
     
     # The cryptographic algorithm used for JWTs.
     algorithm: str = "HS256"
 
-    class Config:
-        """
-        Configuration for the Settings class.
-        """
+    model_config = SettingsConfigDict(
         # Specifies that settings should be loaded from a file named '.env'.
-        env_file = '.env'
+        env_file='.env',
         # Ignores any environment variables that are not explicitly defined
         # as a field in the Settings class.
-        extra = 'ignore'
+        extra='ignore',
+        # Settings are shared across the whole application, so they are read-only.
+        frozen=True,
+    )
 
-# Create a single instance of the Settings class to be used throughout the application.
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Returns the application settings, creating them on first use.
+    The environment and the .env file are parsed only once; every later call
+    (including from code re-imported in tests) returns the same cached instance.
+    """
+    return Settings()
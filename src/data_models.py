@@ -3,6 +3,7 @@
 # also ready to be used as database tables.
 
 from typing import Optional, List
+from sqlalchemy import Column, DateTime, delete, event, func, insert, literal, select, union_all
 from sqlmodel import Field, SQLModel, Relationship
 from datetime import date, datetime
 
@@ -103,7 +104,9 @@ class Placement(SQLModel, table=True):
     status: str
 
     # Define foreign keys to link to other tables.
-    employer_id: Optional[int] = Field(default=None, foreign_key="employer.id")
+    # Indexed so the placements-per-employer report can count placements per employer
+    # without scanning the whole table.
+    employer_id: Optional[int] = Field(default=None, foreign_key="employer.id", index=True)
     mentor_id: Optional[int] = Field(default=None, foreign_key="mentor.id")
 
     # Define relationships.
@@ -112,6 +115,17 @@ class Placement(SQLModel, table=True):
     students: List["Student"] = Relationship(back_populates="placements", link_model=StudentPlacementLink)
     evaluations: List["Evaluation"] = Relationship(back_populates="placement")
 
+    @property
+    def student_ids(self) -> List[int]:
+        """
+        The IDs of the students on this placement, read by `PlacementResponse` through
+        `from_attributes`, so routes can return the placement itself. It is a plain
+        property, so `model_dump()` of the table model never touches `students`; the
+        relationship must already be loaded when it is read, since it can't be
+        lazy-loaded on an async session.
+        """
+        return [student.id for student in self.students]
+
 class Evaluation(SQLModel, table=True):
     """
     Represents an evaluation or feedback form.
@@ -119,7 +133,12 @@ class Evaluation(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     feedback: str
     rating: int
-    created_at: datetime = Field(default_factory=datetime.utcnow) # Automatically sets the creation time.
+    # The creation time is filled in by the database during the INSERT (`server_default`),
+    # so no timestamp has to be built in Python for each new evaluation.
+    created_at: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    )
 
     # Define foreign keys. A single evaluation can link to multiple types of users
     # (subject of evaluation, mentor who evaluated, etc.)
@@ -147,3 +166,77 @@ class Evaluation(SQLModel, table=True):
         back_populates="evaluations_given",
         sa_relationship_kwargs={"foreign_keys": "Evaluation.student_evaluator_id"}
     )
+
+class EmailDirectory(SQLModel, table=True):
+    """
+    Maps every registered email to the role and ID of the account that owns it.
+    Login resolves an email with a single primary-key lookup here instead of
+    searching every user table, and the primary key keeps emails unique across roles.
+    Rows are kept in sync automatically by the mapper events registered below, and
+    `backfill_email_directory` adds the accounts created without them.
+    """
+    email: str = Field(primary_key=True)
+    role: str
+    user_id: int
+
+# --- Email Directory Maintenance ---
+
+# The user tables that can log in, keyed by the role stored in the email directory.
+USER_MODELS_BY_ROLE = {
+    "student": Student,
+    "mentor": Mentor,
+    "employer": Employer,
+}
+ROLES_BY_MODEL = {model: role for role, model in USER_MODELS_BY_ROLE.items()}
+
+def _add_email_directory_entry(mapper, connection, target):
+    """
+    Records a newly inserted user in the email directory, in the same transaction.
+    If the email already belongs to another account the insert fails and the
+    whole transaction, including the new user, is rolled back.
+    """
+    role = ROLES_BY_MODEL[type(target)]
+    connection.execute(
+        insert(EmailDirectory).values(email=target.email, role=role, user_id=target.id)
+    )
+
+def _remove_email_directory_entry(mapper, connection, target):
+    """
+    Removes a deleted user's email from the directory, freeing it for new registrations.
+    """
+    # The directory row is only removed if it belongs to this account, in case the same
+    # email was registered to accounts of two roles before the directory existed.
+    connection.execute(
+        delete(EmailDirectory).where(
+            EmailDirectory.email == target.email,
+            EmailDirectory.role == ROLES_BY_MODEL[type(target)],
+            EmailDirectory.user_id == target.id,
+        )
+    )
+
+def backfill_email_directory(connection) -> list[str]:
+    """
+    Adds a directory row for every account that doesn't have one yet: accounts created
+    before the directory existed, or written without the mapper events (for example
+    with a bulk or raw SQL insert). Safe to run on every startup, since accounts that
+    are already listed are skipped.
+    An email registered to accounts of several roles can only be listed once; the
+    first role in `USER_MODELS_BY_ROLE` keeps it, and the duplicated emails are
+    returned so the caller can report them.
+    """
+    for role, model in USER_MODELS_BY_ROLE.items():
+        unlisted = select(model.email, literal(role), model.id).where(
+            ~select(EmailDirectory.email).where(EmailDirectory.email == model.email).exists()
+        )
+        connection.execute(
+            insert(EmailDirectory).from_select(["email", "role", "user_id"], unlisted)
+        )
+    all_emails = union_all(
+        *(select(model.email.label("email")) for model in USER_MODELS_BY_ROLE.values())
+    ).subquery()
+    duplicates = select(all_emails.c.email).group_by(all_emails.c.email).having(func.count() > 1)
+    return list(connection.execute(duplicates).scalars())
+
+for model in USER_MODELS_BY_ROLE.values():
+    event.listen(model, "after_insert", _add_email_directory_entry)
+    event.listen(model, "after_delete", _remove_email_directory_entry)
@@ -1,36 +1,170 @@
 # Objective: This file manages the database connection and ensures all necessary tables exist.
 # It's set up to work for both a testing environment and the main production database.
 
+import logging
 import time
-from typing import Generator
+from typing import Any, AsyncGenerator, Generator, Optional, TypeVar
 from sqlmodel import create_engine, Session, SQLModel
-from sqlalchemy.engine import URL
-from decouple import config
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import event, update
+from sqlalchemy.engine import URL, Engine
+from sqlalchemy.orm import raiseload
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from .config import get_settings
+from .data_models import backfill_email_directory
+
+# All connection settings come from the cached application settings,
+# so the environment and .env file are only parsed once.
+settings = get_settings()
 
 # Check if the application is running in a testing environment.
 # This setting is defined in your .env file.
-TESTING = config('TESTING', default=False, cast=bool)
+TESTING = settings.testing
+
+# Logging every SQL statement is useful while developing but expensive on the request
+# path, so it is only switched on when SQL_ECHO is set. Pool events are never logged.
+SQL_ECHO = settings.sql_echo
 
-# Define the database connection engine based on the environment.
+logger = logging.getLogger(__name__)
+
+# Two engines point at the same database: a synchronous one used to create the tables
+# and by the `get_db` dependency, and an asynchronous one used by every route, which
+# `await` their queries instead of blocking the event loop.
 if TESTING:
     # For testing, a simple, in-memory SQLite database.
     # This is fast and doesn't require a separate database server.
     sqlite_file_name = "test.db"
     sqlite_url = f"sqlite:///{sqlite_file_name}"
-    # The 'echo=True' flag will print all SQL statements to the console, which is
+    # SQLite locks the whole file while writing, so a connection waits up to 30 seconds
+    # for another writer to finish instead of failing at once with "database is locked".
+    # The database is a file rather than `:memory:`, so every pooled connection sees the
+    # same data and no StaticPool (one connection shared by every session) is needed.
+    sqlite_connect_args = {"timeout": 30}
+    # Setting SQL_ECHO prints all SQL statements to the console, which is
     # useful for debugging in development.
-    engine = create_engine(sqlite_url, echo=True)
+    engine = create_engine(
+        sqlite_url,
+        echo=SQL_ECHO,
+        echo_pool=False,
+        query_cache_size=settings.db_query_cache_size,
+        # `get_db` is a sync dependency that FastAPI runs in its threadpool, so a pooled
+        # connection may be used by a different thread than the one that opened it.
+        connect_args={**sqlite_connect_args, "check_same_thread": False},
+    )
+    async_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{sqlite_file_name}",
+        echo=SQL_ECHO,
+        echo_pool=False,
+        query_cache_size=settings.db_query_cache_size,
+        connect_args=sqlite_connect_args,
+    )
 else:
     # For the live application, the PostgreSQL database.
     # The `host='db'` is important for Docker, as it connects to the database service.
-    engine = create_engine(URL.create(
-        drivername="postgresql+psycopg2",
-        username=config('POSTGRES_USER'),
-        password=config('POSTGRES_PASSWORD'),
-        host=config('POSTGRES_HOST', default='db'),
-        port=config('POSTGRES_PORT', default=5432, cast=int),
-        database=config('POSTGRES_DB')
-    ), echo=True)
+    def _postgres_url(drivername: str) -> URL:
+        """
+        Builds the PostgreSQL connection URL for the given driver.
+        """
+        return URL.create(
+            drivername=drivername,
+            username=settings.postgres_user,
+            password=settings.postgres_password,
+            host=settings.postgres_host,
+            port=settings.postgres_port,
+            database=settings.postgres_db
+        )
+
+    # Options shared by both engines. Connections are kept in a QueuePool so requests
+    # reuse an open connection instead of paying for a new TCP connection and
+    # authentication each time.
+    engine_options = dict(
+        # Recycle connections every half hour so they are never dropped by the server
+        # (or a firewall's idle timeout) mid-request.
+        pool_recycle=1800,
+        # Fail a request after this long instead of letting it queue indefinitely
+        # for a connection.
+        pool_timeout=settings.db_pool_timeout,
+        # Test connections before use; set DB_POOL_PRE_PING=False when PgBouncer
+        # sits in front of the database and already handles dead connections.
+        pool_pre_ping=settings.db_pool_pre_ping,
+        # Hand out the most recently used connection first, keeping a small set of
+        # connections warm and letting idle ones time out.
+        pool_use_lifo=True,
+        # Reuse the compiled SQL of statements that have run before.
+        query_cache_size=settings.db_query_cache_size,
+    )
+    # No mounted route uses the sync engine; it only creates the tables at startup and
+    # serves scripts and the `get_db` dependency, so it keeps a small pool.
+    engine = create_engine(
+        _postgres_url("postgresql+psycopg2"),
+        echo=SQL_ECHO,
+        echo_pool=False,
+        pool_size=settings.db_sync_pool_size,
+        max_overflow=settings.db_sync_max_overflow,
+        **engine_options
+    )
+    # asyncpg speaks PostgreSQL's binary protocol and decodes rows in C. Each connection
+    # also keeps the statements it has prepared, so a repeated query skips parsing and
+    # planning on the server as well. This is the engine every route uses, so it
+    # gets the larger pool.
+    async_engine = create_async_engine(
+        _postgres_url("postgresql+asyncpg"),
+        echo=SQL_ECHO,
+        echo_pool=False,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        connect_args={
+            "prepared_statement_cache_size": settings.db_statement_cache_size,
+            "statement_cache_size": settings.db_statement_cache_size,
+        },
+        **engine_options
+    )
+
+def _log_slow_queries(sync_engine: Engine) -> None:
+    """
+    Registers cursor event hooks on an engine that time every statement and log
+    the ones slower than SLOW_QUERY_THRESHOLD_MS as warnings. This keeps slow
+    queries visible without the cost of echoing every statement.
+    """
+    threshold = settings.slow_query_threshold_ms / 1000
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _stop_timer(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+        if elapsed >= threshold:
+            logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, statement)
+
+_log_slow_queries(engine)
+# Async engines fire their events on the synchronous engine they wrap.
+_log_slow_queries(async_engine.sync_engine)
+
+def _use_fast_sqlite_pragmas(sync_engine: Engine) -> None:
+    """
+    Makes every new connection to the SQLite database skip the fsync on commit.
+    In WAL mode readers don't block the writer, and with `synchronous=OFF` a commit
+    returns as soon as SQLite hands the data to the OS. A crash or power loss can lose
+    the last commits or corrupt the file, so this is only enabled by
+    SQLITE_UNSAFE_FAST_WRITES, which the test suite sets.
+    """
+    @event.listens_for(sync_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+if TESTING and settings.sqlite_unsafe_fast_writes:
+    _use_fast_sqlite_pragmas(engine)
+    _use_fast_sqlite_pragmas(async_engine.sync_engine)
+
+# Factory for asynchronous sessions. Objects are not expired on commit, because
+# reloading an expired attribute would need a hidden query that can't be awaited.
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
 
 def create_db_and_tables():
     """
@@ -43,6 +177,7 @@ def create_db_and_tables():
         print("Skipping database connection for testing environment.")
         SQLModel.metadata.create_all(engine)
         print("Tables created for in-memory SQLite.")
+        _backfill_email_directory()
         return
 
     # For the live application, connect a few times.
@@ -68,6 +203,21 @@ def create_db_and_tables():
     # This command uses the metadata from all the SQLModel classes to create the tables.
     SQLModel.metadata.create_all(engine)
     print("Tables created.")
+    _backfill_email_directory()
+
+def _backfill_email_directory():
+    """
+    Lists every existing account in the email directory that login resolves emails
+    through. `create_all` only creates a missing directory table empty, so without
+    this, accounts created before the directory existed could no longer log in.
+    """
+    with engine.begin() as connection:
+        duplicates = backfill_email_directory(connection)
+    if duplicates:
+        logger.warning(
+            "These emails belong to accounts of more than one role; only the first role "
+            "can log in with them: %s", ", ".join(sorted(duplicates))
+        )
 
 def get_db() -> Generator[Session, None, None]:
     """
@@ -77,3 +227,34 @@ def get_db() -> Generator[Session, None, None]:
     """
     with Session(engine) as session:
         yield session
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Returns a new asynchronous database session for an API request.
+    This is the dependency to use in `async def` route functions, which must
+    `await` every query made through the session.
+    """
+    async with AsyncSessionLocal() as session:
+        yield session
+
+# Loader option for reads whose response only needs a row's own columns. Any access to
+# an unloaded relationship raises an error instead of silently issuing one extra query
+# per row, so a response model that starts reading a relationship fails loudly.
+NO_RELATIONSHIP_LOADS = raiseload("*")
+
+ModelType = TypeVar("ModelType", bound=SQLModel)
+
+async def update_by_id(
+    db: AsyncSession, model: type[ModelType], row_id: int, values: dict[str, Any]
+) -> Optional[ModelType]:
+    """
+    Applies `values` to the row of `model` with the given ID and returns the updated
+    object, or `None` if there is no such row. A single `UPDATE ... RETURNING` statement
+    replaces loading the object, changing it and refreshing it after the commit.
+    The caller still commits the transaction.
+    """
+    if not values:
+        # An empty PATCH has nothing to update, so the row is only looked up.
+        return await db.get(model, row_id)
+    statement = update(model).where(model.id == row_id).values(**values).returning(model)
+    return (await db.exec(statement)).scalar_one_or_none()
@@ -2,7 +2,11 @@
 # It sets up the app, defines its metadata, connects to the database,
 # and includes all the different API routers.
 
-from fastapi import FastAPI
+import logging
+
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import SQLAlchemyError
 from sqlmodel import SQLModel
 from contextlib import asynccontextmanager
 import uvicorn
@@ -14,11 +18,11 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Import the database engine and the function to create tables.
-from .database import engine, create_db_and_tables
+from .database import engine, async_engine, create_db_and_tables
 
 # Import all the routers, which contain the specific API endpoints for
 # each part of your application (e.g., students, mentors, etc.).
-from .routers import auth, students, mentors, employers, placements, evaluations
+from .routers import auth, students, mentors, employers, placements, evaluations, users, reports
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -33,11 +37,17 @@ async def lifespan(app: FastAPI):
     create_db_and_tables()
     yield
     # Any code after 'yield' will be executed on application shutdown.
+    # Close the pooled asynchronous connections cleanly.
+    await async_engine.dispose()
     print("Application shutdown.")
 
 # Create the main FastAPI application instance.
 # We're providing a title, description, and version for the auto-generated
 # API documentation (available at /docs).
+# No `default_response_class` is set on purpose: for routes with a `response_model`,
+# FastAPI's default serializes the response to JSON bytes directly in Pydantic's Rust
+# core. A custom class such as `ORJSONResponse` would turn that off and go through an
+# intermediate Python dict instead.
 app = FastAPI(
     title="Internship Placement Manager API",
     description="API for managing student internships, mentors, and employers.",
@@ -45,6 +55,22 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+logger = logging.getLogger(__name__)
+
+@app.exception_handler(SQLAlchemyError)
+async def database_error_handler(request: Request, exc: SQLAlchemyError):
+    """
+    Turns any database error a route doesn't handle itself into a 500 response.
+    The request's session rolls back its transaction when the session dependency
+    closes, so routes don't need their own `try/except` around every commit.
+    The error itself is only logged, since it can contain SQL and parameter values.
+    """
+    logger.error("Database error on %s %s", request.method, request.url.path, exc_info=exc)
+    return JSONResponse(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        content={"detail": "A database error occurred."},
+    )
+
 @app.get("/")
 def read_root():
     """
@@ -61,6 +87,9 @@ app.include_router(mentors.router, prefix="/api/v1/mentors", tags=["Mentors"])
 app.include_router(employers.router, prefix="/api/v1/employers", tags=["Employers"])
 app.include_router(placements.router, prefix="/api/v1/placements", tags=["Placements"])
 app.include_router(evaluations.router, prefix="/api/v1/evaluations", tags=["Evaluations"])
+# The users and reports routers set their own prefixes and tags.
+app.include_router(users.router, prefix="/api/v1")
+app.include_router(reports.router, prefix="/api/v1")
 
 # This block allows you to run the application directly from this file using Uvicorn.
 # It's useful for local development and testing.
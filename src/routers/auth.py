@@ -6,22 +6,49 @@
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlmodel import Session, select
+from sqlalchemy import and_, func, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 # Import necessary schemas and data models from our application
 from .. import schemas, data_models
 # Import database session dependency
-from ..database import get_db
+from ..database import get_async_db
 # Import password verification and token creation functions from our auth utilities
-from ..auth import verify_password, create_access_token
+from ..auth import DUMMY_HASH, verify_and_update_password_async, create_access_token, get_current_user, revoke_token, oauth2_scheme
 
 # Initialize a FastAPI router with a tag for grouping related endpoints in the documentation
 router = APIRouter(tags=["Authentication"])
 
+def _user_lookup_statement(email: str):
+    """
+    Builds a single query that finds the account owning an email and its password hash.
+    The email is resolved through its primary key in the email directory, which names
+    the role and ID of the account; the outer joins then fetch the password hash by
+    primary key from the one user table that matches the role. The whole login costs
+    one round trip made of two primary-key lookups.
+    That is also why user tables aren't queried concurrently with `asyncio.gather`:
+    an `AsyncSession` can only run one statement at a time, and even with separate
+    sessions the login would wait on several round trips and hold several pooled connections.
+    """
+    directory = data_models.EmailDirectory
+    models = data_models.USER_MODELS_BY_ROLE
+    statement = select(
+        directory.role,
+        directory.user_id.label("id"),
+        directory.email,
+        func.coalesce(*(model.hashed_password for model in models.values())).label("hashed_password"),
+    )
+    for role, model in models.items():
+        statement = statement.outerjoin(
+            model, and_(directory.role == role, model.id == directory.user_id)
+        )
+    return statement.where(directory.email == email)
+
 @router.post("/token", response_model=schemas.Token)
-def login_for_access_token(
+async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Handles user login by validating credentials and returning a JWT access token.
@@ -37,35 +64,48 @@ def login_for_access_token(
     Raises:
         HTTPException: If the username or password is incorrect.
     """
-    # Attempt to find the user in the database by their email across multiple tables
-    # First, check for a Student
-    user = db.exec(
-        select(data_models.Student).where(data_models.Student.email == form_data.username)
-    ).first()
-
-    # If not a student, check for a Mentor
-    if not user:
-        user = db.exec(
-            select(data_models.Mentor).where(data_models.Mentor.email == form_data.username)
-        ).first()
+    # Attempt to find the user in the database by their email across all user tables
+    user = (await db.exec(_user_lookup_statement(form_data.username))).first()
+    # A directory row whose account no longer exists (for example after a delete that
+    # bypassed the mapper events) has no password hash, and is treated as unknown.
+    if user is not None and user.hashed_password is None:
+        user = None
 
-    # If not a mentor, check for an Employer
-    if not user:
-        user = db.exec(
-            select(data_models.Employer).where(data_models.Employer.email == form_data.username)
-        ).first()
+    # Always verify a password, using a dummy hash when the user doesn't exist, so that
+    # unknown emails take as long to reject as wrong passwords.
+    verified, new_hash = await verify_and_update_password_async(
+        form_data.password, user.hashed_password if user else DUMMY_HASH
+    )
 
     # If no user is found or the password doesn't match the stored hash, raise an authentication error
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+    # Transparently upgrade hashes created with an older scheme (e.g. sha256_crypt)
+    # now that we know the plaintext password is correct.
+    if new_hash:
+        model = data_models.USER_MODELS_BY_ROLE[user.role]
+        await db.exec(update(model).where(model.id == user.id).values(hashed_password=new_hash))
+        await db.commit()
     
     # If authentication is successful, create a new JWT access token
     # The 'sub' (subject) of the token is the user's email
-    access_token = create_access_token(data={"sub": user.email})
+    access_token = create_access_token(user.email)
     
     # Return the token to the client
     return {"access_token": access_token, "token_type": "bearer"}
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(
+    token: str = Depends(oauth2_scheme),
+    current_user=Depends(get_current_user)
+):
+    """
+    Logs the current user out by revoking the access token used for this request.
+    Any further request made with the same token is rejected with a 401.
+    """
+    revoke_token(token)
@@ -1,97 +1,65 @@
 # Objectives:
 # This file defines all API endpoints for managing evaluations.
 # It provides a complete set of RESTful routes for:
-# - Creating a new evaluation with validation to ensure only one type of evaluator is specified.
+# - Creating a new evaluation, whose schema ensures only one type of evaluator is specified.
 # - Retrieving a list of all evaluations.
 # - Fetching a single evaluation by its ID.
 # - Updating an existing evaluation.
 # - Deleting an evaluation.
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List
 
 # Import our Pydantic schemas for data validation and response models
 from .. import schemas, data_models
 # Import the database session dependency
-from ..database import get_db
+from ..database import NO_RELATIONSHIP_LOADS, get_async_db, update_by_id
+# Import the response cache decorators
+from ..cache import cached, invalidates
 
 # Initialize a new APIRouter with a tag for grouping these endpoints in the API documentation
 router = APIRouter(tags=["Evaluations"])
 
 @router.post("/", response_model=schemas.EvaluationResponse, status_code=status.HTTP_201_CREATED)
-def create_evaluation(
+@invalidates("evaluations")
+async def create_evaluation(
     evaluation: schemas.EvaluationCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Creates a new evaluation in the database.
     
-    This function includes a critical validation step to ensure that only one of the
-    three evaluator types (mentor, employer, or student) is provided in the request.
-    If none or more than one are provided, it raises an HTTP error.
+    `EvaluationCreate` already ensures that exactly one of the three evaluator
+    types (mentor, employer, or student) is provided, so invalid requests are
+    rejected with a 422 before this function runs.
     """
-    # Create a list of tuples containing the evaluator ID name and its value
-    evaluator_ids = [
-        ("mentor_evaluator_id", evaluation.mentor_evaluator_id),
-        ("employer_evaluator_id", evaluation.employer_evaluator_id),
-        ("student_evaluator_id", evaluation.student_evaluator_id)
-    ]
-    
-    # Filter the list to find which evaluator IDs were actually provided (are not None)
-    provided_evaluators = [name for name, id_val in evaluator_ids if id_val is not None]
-
-    # Raise an error if no evaluator ID was provided
-    if not provided_evaluators:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="At least one evaluator ID must be provided."
-        )
-    # Raise an error if more than one evaluator ID was provided
-    if len(provided_evaluators) > 1:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Only one type of evaluator can be provided at a time."
-        )
-
     # Create the `Evaluation` data model instance from the validated input
-    db_evaluation = data_models.Evaluation(
-        feedback=evaluation.feedback,
-        rating=evaluation.rating,
-        placement_id=evaluation.placement_id,
-        subject_id=evaluation.subject_id,
-        mentor_evaluator_id=evaluation.mentor_evaluator_id,
-        employer_evaluator_id=evaluation.employer_evaluator_id,
-        student_evaluator_id=evaluation.student_evaluator_id
-    )
+    db_evaluation = data_models.Evaluation(**evaluation.model_dump())
 
-    # Use a try-except block to handle potential database errors during the creation process
-    try:
-        db.add(db_evaluation)
-        db.commit()
-        db.refresh(db_evaluation)
-        return db_evaluation
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"An error occurred while creating the evaluation: {e}"
-        )
+    # Database errors are left to the application's SQLAlchemyError handler
+    db.add(db_evaluation)
+    await db.commit()
+    await db.refresh(db_evaluation)
+    return db_evaluation
 
 @router.get("/", response_model=List[schemas.EvaluationResponse])
-def get_all_evaluations(db: Session = Depends(get_db)):
+@cached("evaluations", List[schemas.EvaluationResponse])
+async def get_all_evaluations(db: AsyncSession = Depends(get_async_db)):
     """
     Retrieves a list of all evaluations from the database.
     """
-    evaluations = db.exec(select(data_models.Evaluation)).all()
+    evaluations = (await db.exec(select(data_models.Evaluation).options(NO_RELATIONSHIP_LOADS))).all()
     return evaluations
 
 @router.get("/{evaluation_id}", response_model=schemas.EvaluationResponse)
-def get_evaluation_by_id(evaluation_id: int, db: Session = Depends(get_db)):
+@cached("evaluations", schemas.EvaluationResponse)
+async def get_evaluation_by_id(evaluation_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Retrieves a single evaluation by its unique ID.
     """
-    evaluation = db.get(data_models.Evaluation, evaluation_id)
+    evaluation = await db.get(data_models.Evaluation, evaluation_id, options=[NO_RELATIONSHIP_LOADS])
     if not evaluation:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -100,45 +68,41 @@ def get_evaluation_by_id(evaluation_id: int, db: Session = Depends(get_db)):
     return evaluation
 
 @router.patch("/{evaluation_id}", response_model=schemas.EvaluationResponse)
-def update_evaluation(
+@invalidates("evaluations")
+async def update_evaluation(
     evaluation_id: int,
     evaluation_update: schemas.EvaluationUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Updates an existing evaluation.
     This is a PATCH endpoint, so it only updates the fields provided in the request body.
     """
-    evaluation = db.get(data_models.Evaluation, evaluation_id)
+    # Get the data from the Pydantic update model, excluding any unset fields,
+    # and apply it with a single UPDATE ... RETURNING statement
+    evaluation_data = evaluation_update.model_dump(exclude_unset=True)
+    evaluation = await update_by_id(db, data_models.Evaluation, evaluation_id, evaluation_data)
     if not evaluation:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Evaluation not found"
         )
-    
-    # Get the data from the Pydantic update model, excluding any unset fields
-    evaluation_data = evaluation_update.model_dump(exclude_unset=True)
-    # Loop through the update data and apply it to the database object
-    for key, value in evaluation_data.items():
-        setattr(evaluation, key, value)
-    
-    db.add(evaluation)
-    db.commit()
-    db.refresh(evaluation)
+    await db.commit()
     return evaluation
 
 @router.delete("/{evaluation_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_evaluation(evaluation_id: int, db: Session = Depends(get_db)):
+@invalidates("evaluations")
+async def delete_evaluation(evaluation_id: int, db: AsyncSession = Depends(get_async_db)) -> Response:
     """
     Deletes an evaluation by its ID.
     """
-    evaluation = db.get(data_models.Evaluation, evaluation_id)
+    evaluation = await db.get(data_models.Evaluation, evaluation_id)
     if not evaluation:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Evaluation not found"
         )
     
-    db.delete(evaluation)
-    db.commit()
-    return None
+    await db.delete(evaluation)
+    await db.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -9,77 +9,53 @@
 # Note: These endpoints are designed for public sign-up and don't require authentication,
 # but you can easily add authentication with `Depends(get_current_user)` if you need to.
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List
 
 # Import our Pydantic schemas for data validation and API response models
 from .. import schemas, data_models, auth
 # Import the database session dependency
-from ..database import get_db
+from ..database import NO_RELATIONSHIP_LOADS, get_async_db, update_by_id
+# Import the response cache decorators
+from ..cache import cached, invalidates
+# Import the shared user registration helper
+from ..utils import register_user
 
 # Initialize a new APIRouter with a tag for grouping these endpoints in the API documentation
 router = APIRouter(tags=["Mentors"])
 
 @router.post("/", response_model=schemas.MentorResponse, status_code=status.HTTP_201_CREATED)
-def create_mentor(
+async def create_mentor(
     mentor: schemas.MentorCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Creates a new mentor account.
+    A duplicate email is rejected with a 409 Conflict by the shared registration helper.
     """
-    # Check if a mentor with the same email already exists in the database
-    existing_mentor = db.exec(
-        select(data_models.Mentor).where(data_models.Mentor.email == mentor.email)
-    ).first()
-    if existing_mentor:
-        # Raise an HTTPException with a 409 Conflict status code if the email is already in use
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="Mentor with this email already exists"
-        )
-    
-    # Hash the provided password before storing it for security
-    hashed_password = auth.get_password_hash(mentor.password)
-    
-    # Create a new `Mentor` data model instance from the validated input
-    db_mentor = data_models.Mentor(
-        full_name=mentor.full_name,
-        email=mentor.email,
-        field=mentor.field,
-        hashed_password=hashed_password
+    return await register_user(
+        db, data_models.Mentor, mentor,
+        conflict_detail="Mentor with this email already exists"
     )
 
-    # Use a try-except block to handle potential database errors during the creation process
-    try:
-        # Add the new object to the session, commit, and refresh to get its ID
-        db.add(db_mentor)
-        db.commit()
-        db.refresh(db_mentor)
-        return db_mentor
-    except Exception as e:
-        # Rollback the transaction in case of an error to prevent partial commits
-        db.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"An error occurred while creating the mentor: {e}"
-        )
-
 @router.get("/", response_model=List[schemas.MentorResponse])
-def get_all_mentors(db: Session = Depends(get_db)):
+@cached("mentors", List[schemas.MentorResponse])
+async def get_all_mentors(db: AsyncSession = Depends(get_async_db)):
     """
     Retrieves a list of all mentors from the database.
     """
-    mentors = db.exec(select(data_models.Mentor)).all()
+    mentors = (await db.exec(select(data_models.Mentor).options(NO_RELATIONSHIP_LOADS))).all()
     return mentors
 
 @router.get("/{mentor_id}", response_model=schemas.MentorResponse)
-def get_mentor_by_id(mentor_id: int, db: Session = Depends(get_db)):
+@cached("mentors", schemas.MentorResponse)
+async def get_mentor_by_id(mentor_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Retrieves a single mentor by their unique ID.
     """
-    mentor = db.get(data_models.Mentor, mentor_id)
+    mentor = await db.get(data_models.Mentor, mentor_id, options=[NO_RELATIONSHIP_LOADS])
     if not mentor:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -88,51 +64,48 @@ def get_mentor_by_id(mentor_id: int, db: Session = Depends(get_db)):
     return mentor
 
 @router.patch("/{mentor_id}", response_model=schemas.MentorResponse)
-def update_mentor(
+@invalidates("mentors")
+async def update_mentor(
     mentor_id: int,
     mentor_update: schemas.MentorUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Updates an existing mentor's details.
     This is a PATCH endpoint, so it only updates the fields provided in the request body.
     """
-    mentor = db.get(data_models.Mentor, mentor_id)
+    # Use model_dump to get only the fields that were set in the Pydantic update model
+    mentor_data = mentor_update.model_dump(exclude_unset=True)
+    
+    # Remove the plain-text password from the update dictionary, and hash it before storing.
+    # An explicit `null` password leaves the current one in place, without paying for a hash.
+    password = mentor_data.pop("password", None)
+    if password is not None:
+        mentor_data["hashed_password"] = await auth.get_password_hash_async(password)
+        
+    # Apply the update data with a single UPDATE ... RETURNING statement
+    mentor = await update_by_id(db, data_models.Mentor, mentor_id, mentor_data)
     if not mentor:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Mentor not found"
         )
-    
-    # Use model_dump to get only the fields that were set in the Pydantic update model
-    mentor_data = mentor_update.model_dump(exclude_unset=True)
-    
-    # Check if the `password` is being updated and hash it before storing
-    if "password" in mentor_data:
-        mentor_data["hashed_password"] = auth.get_password_hash(mentor_data["password"])
-        del mentor_data["password"] # Remove the plain-text password from the update dictionary
-        
-    # Loop through the update data and apply it to the database object
-    for key, value in mentor_data.items():
-        setattr(mentor, key, value)
-    
-    db.add(mentor)
-    db.commit()
-    db.refresh(mentor)
+    await db.commit()
     return mentor
 
 @router.delete("/{mentor_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_mentor(mentor_id: int, db: Session = Depends(get_db)):
+@invalidates("mentors", "placements", "evaluations")
+async def delete_mentor(mentor_id: int, db: AsyncSession = Depends(get_async_db)) -> Response:
     """
     Deletes a mentor account by their ID.
     """
-    mentor = db.get(data_models.Mentor, mentor_id)
+    mentor = await db.get(data_models.Mentor, mentor_id)
     if not mentor:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Mentor not found"
         )
     
-    db.delete(mentor)
-    db.commit()
-    return {"message": "Mentor deleted"}
+    await db.delete(mentor)
+    await db.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
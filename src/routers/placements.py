@@ -10,29 +10,95 @@
 # A key feature of this file is handling the many-to-many relationship between Placements and Students
 # using the `StudentPlacementLink` model.
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import JSON, func, insert
+from sqlalchemy.orm import selectinload
+from sqlmodel import delete, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List
 
 # Import Pydantic schemas for data validation and API response models
 from .. import schemas, data_models
 # Import the database session dependency
-from ..database import get_db
+from ..database import NO_RELATIONSHIP_LOADS, async_engine, get_async_db, update_by_id
+# Import the response cache decorators
+from ..cache import cached, invalidates
 
 # Initialize a new APIRouter with a tag for grouping these endpoints in the API documentation
 router = APIRouter(tags=["Placements"])
 
+# Eagerly loads the students of every selected placement in one extra `IN` query,
+# instead of one lazy-load query per placement when `placement.students` is read.
+# Only the student IDs are needed for the response, so only that column is loaded.
+students_ids_loader = selectinload(data_models.Placement.students).load_only(data_models.Student.id)
+
+def _student_ids_aggregate():
+    """
+    Returns an aggregate that collects the student IDs of each placement into a list,
+    so the link table can be grouped in SQL instead of loading `Student` objects.
+    PostgreSQL has native arrays; SQLite builds a JSON array, which the `JSON` type
+    decodes into a list. The filter leaves out the NULL row an outer join produces
+    for a placement without students.
+    """
+    link = data_models.StudentPlacementLink
+    has_student = link.student_id.is_not(None)
+    if async_engine.dialect.name == "postgresql":
+        return func.array_agg(link.student_id).filter(has_student)
+    return func.json_group_array(link.student_id, type_=JSON).filter(has_student)
+
+# Lists every placement with its student IDs in a single grouped query. Only the
+# placement's own columns are selected, so no ORM objects are created either.
+all_placements_statement = (
+    select(
+        *data_models.Placement.__table__.columns,
+        _student_ids_aggregate().label("student_ids"),
+    )
+    .select_from(data_models.Placement)
+    .outerjoin(data_models.StudentPlacementLink)
+    .group_by(data_models.Placement.id)
+    .order_by(data_models.Placement.id)
+)
+
+async def _existing_student_ids(db: AsyncSession, student_ids: List[int]) -> List[int]:
+    """
+    Returns `student_ids` without repeats (in their original order), after checking
+    with a single `IN` query that every student exists; a missing one is a 404.
+    A repeated ID would otherwise insert the same link twice and fail on the link
+    table's primary key.
+    """
+    unique_ids = list(dict.fromkeys(student_ids))
+    if not unique_ids:
+        return unique_ids
+    found_ids = set(
+        (await db.exec(
+            select(data_models.Student.id).where(data_models.Student.id.in_(unique_ids))
+        )).all()
+    )
+    missing_ids = sorted(set(unique_ids) - found_ids)
+    if missing_ids:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Students with IDs {missing_ids} not found"
+        )
+    return unique_ids
+
 @router.post("/", response_model=schemas.PlacementResponse, status_code=status.HTTP_201_CREATED)
-def create_placement(
+@invalidates("placements", "reports")
+async def create_placement(
     placement: schemas.PlacementCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Creates a new placement and associates it with a list of students.
     
     This function handles the two-step process of creating the placement itself and
-    then creating the necessary `StudentPlacementLink` records for each student.
+    then creating the necessary `StudentPlacementLink` records for each student,
+    both in a single transaction.
     """
+    # Verify the students before anything is written, so a bad ID doesn't leave a
+    # half-created placement.
+    student_ids = await _existing_student_ids(db, placement.student_ids)
+
     # Create the placement data model object from the request body
     db_placement = data_models.Placement(
         title=placement.title,
@@ -44,118 +110,86 @@ def create_placement(
         mentor_id=placement.mentor_id
     )
 
-    try:
-        # Step 1: Add and commit the new placement to the database.
-        # This is necessary to get its ID, which is a foreign key for the link table.
-        db.add(db_placement)
-        db.commit()
-        db.refresh(db_placement)
-        
-        # Step 2: Create the many-to-many links for each student ID provided
-        for student_id in placement.student_ids:
-            # First, verify that the student actually exists. This is crucial for data integrity.
-            existing_student = db.get(data_models.Student, student_id)
-            if not existing_student:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Student with ID {student_id} not found"
-                )
-
-            # Create the link object and add it to the database session
-            student_link = data_models.StudentPlacementLink(
-                student_id=student_id,
-                placement_id=db_placement.id
-            )
-            db.add(student_link)
-
-        # Commit the new links
-        db.commit()
-        db.refresh(db_placement) # Refresh again to load the new relationships
-        
-        # Prepare the response. The `PlacementResponse` schema needs a `student_ids` list,
-        # which we can now get from the refreshed `students` relationship.
-        student_ids = [s.id for s in db_placement.students]
-        # model_dump is used here to get a dictionary of all the placement fields
-        response_data = db_placement.model_dump()
-        # The `student_ids` list is then manually added to the dictionary
-        response_data["student_ids"] = student_ids
-        
-        return response_data
-    except Exception as e:
-        # Rollback the entire transaction if any part of the process fails
-        db.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"An error occurred while creating the placement: {e}"
+    # Database errors are left to the application's SQLAlchemyError handler; they roll
+    # back the whole transaction, so no placement is left behind without its links.
+    # Step 1: Add the new placement and flush it to the database. This assigns its ID,
+    # which is a foreign key for the link table, without committing yet.
+    db.add(db_placement)
+    await db.flush()
+    
+    # Step 2: Create the many-to-many links for each student ID provided, with one
+    # multi-row INSERT that bypasses the ORM's per-object unit of work
+    if student_ids:
+        await db.exec(
+            insert(data_models.StudentPlacementLink),
+            params=[
+                {"student_id": student_id, "placement_id": db_placement.id}
+                for student_id in student_ids
+            ],
         )
 
+    # Commit the placement and its links together
+    await db.commit()
+    
+    # The links were just written from `student_ids`, so the response uses that list
+    # instead of reloading the `students` relationship.
+    return schemas.PlacementResponse(**db_placement.model_dump(), student_ids=student_ids)
+
 @router.get("/", response_model=List[schemas.PlacementResponse])
-def get_all_placements(db: Session = Depends(get_db)):
+@cached("placements", List[schemas.PlacementResponse])
+async def get_all_placements(db: AsyncSession = Depends(get_async_db)):
     """
     Retrieves a list of all placements from the database.
     """
-    # Execute the query to get all placements
-    placements = db.exec(select(data_models.Placement)).all()
-    
-    # Manually build the list of `PlacementResponse` objects
-    response_placements = []
-    for placement in placements:
-        # Extract the list of student IDs from the `students` relationship
-        student_ids = [student.id for student in placement.students]
-        response_placements.append(
-            schemas.PlacementResponse(
-                id=placement.id,
-                title=placement.title,
-                description=placement.description,
-                start_date=placement.start_date,
-                end_date=placement.end_date,
-                status=placement.status,
-                student_ids=student_ids,
-                employer_id=placement.employer_id,
-                mentor_id=placement.mentor_id
-            )
-        )
-    return response_placements
+    # Execute the query to get all placements, together with their student IDs
+    rows = (await db.exec(all_placements_statement)).all()
+    # PostgreSQL's `array_agg` returns NULL instead of an empty array for a placement
+    # without students, so that case is mapped to an empty list here.
+    return [
+        schemas.PlacementResponse(**{**row._mapping, "student_ids": row.student_ids or []})
+        for row in rows
+    ]
 
 @router.get("/{placement_id}", response_model=schemas.PlacementResponse)
-def get_placement_by_id(placement_id: int, db: Session = Depends(get_db)):
+@cached("placements", schemas.PlacementResponse)
+async def get_placement_by_id(placement_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Retrieves a single placement by its unique ID.
     """
-    placement = db.get(data_models.Placement, placement_id)
+    # Only the student IDs are loaded; every other relationship is blocked.
+    placement = (await db.exec(
+        select(data_models.Placement)
+        .where(data_models.Placement.id == placement_id)
+        .options(students_ids_loader, NO_RELATIONSHIP_LOADS)
+    )).first()
     if not placement:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Placement not found"
         )
-    
-    # Extract the list of student IDs from the `students` relationship
-    student_ids = [student.id for student in placement.students]
-    
-    # Return the response model with the student IDs included
-    return schemas.PlacementResponse(
-        id=placement.id,
-        title=placement.title,
-        description=placement.description,
-        start_date=placement.start_date,
-        end_date=placement.end_date,
-        status=placement.status,
-        student_ids=student_ids,
-        employer_id=placement.employer_id,
-        mentor_id=placement.mentor_id
-    )
+    return placement
 
 @router.patch("/{placement_id}", response_model=schemas.PlacementResponse)
-def update_placement(
+@invalidates("placements", "reports")
+async def update_placement(
     placement_id: int,
     placement_update: schemas.PlacementUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Updates an existing placement by its ID.
     This also handles updating the many-to-many relationship with students.
     """
-    placement = db.get(data_models.Placement, placement_id)
+    # Validate and dedupe the new students first, as when creating a placement
+    student_ids = None
+    if placement_update.student_ids is not None:
+        student_ids = await _existing_student_ids(db, placement_update.student_ids)
+
+    # Update the placement's own fields with a single UPDATE ... RETURNING statement
+    placement_data = placement_update.model_dump(exclude_unset=True)
+    # Remove `student_ids` from the dictionary so it doesn't get set directly on the `Placement` model
+    placement_data.pop("student_ids", None)
+    placement = await update_by_id(db, data_models.Placement, placement_id, placement_data)
     if not placement:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -163,63 +197,51 @@ def update_placement(
         )
     
     # Handle the many-to-many relationship separately
-    if placement_update.student_ids is not None:
-        # Get all existing links for this placement and delete them
-        existing_links = db.exec(
-            select(data_models.StudentPlacementLink).where(
+    if student_ids is not None:
+        # Delete all existing links for this placement in a single statement
+        await db.exec(
+            delete(data_models.StudentPlacementLink).where(
                 data_models.StudentPlacementLink.placement_id == placement_id
             )
-        ).all()
-        for link in existing_links:
-            db.delete(link)
+        )
         
-        # Create a new link for each student ID in the updated list
-        for student_id in placement_update.student_ids:
-            new_link = data_models.StudentPlacementLink(
-                student_id=student_id,
-                placement_id=placement_id
+        # Create a new link for each student ID in the updated list, in a single INSERT
+        if student_ids:
+            await db.exec(
+                insert(data_models.StudentPlacementLink),
+                params=[
+                    {"student_id": student_id, "placement_id": placement_id}
+                    for student_id in student_ids
+                ],
             )
-            db.add(new_link)
-
-    # Now, update the other fields of the placement
-    placement_data = placement_update.model_dump(exclude_unset=True)
-    # Remove `student_ids` from the dictionary so it doesn't get set directly on the `Placement` model
-    placement_data.pop("student_ids", None)
-    for key, value in placement_data.items():
-        setattr(placement, key, value)
-    
-    db.add(placement)
-    db.commit()
-    db.refresh(placement)
-    
-    # Manually prepare the response model
-    student_ids = [s.id for s in placement.students]
-    response_data = placement.model_dump()
-    response_data["student_ids"] = student_ids
 
-    return response_data
+    await db.commit()
+    # Lazy loading isn't available on an async session, so the updated `students`
+    # relationship is loaded explicitly.
+    await db.refresh(placement, attribute_names=["students"])
+    return placement
 
 @router.delete("/{placement_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_placement(placement_id: int, db: Session = Depends(get_db)):
+@invalidates("placements", "evaluations", "reports")
+async def delete_placement(placement_id: int, db: AsyncSession = Depends(get_async_db)) -> Response:
     """
     Deletes a placement by its ID.
     """
-    placement = db.get(data_models.Placement, placement_id)
+    placement = await db.get(data_models.Placement, placement_id)
     if not placement:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Placement not found"
         )
     
-    # Crucially, delete the associated student links first to avoid foreign key errors
-    existing_links = db.exec(
-        select(data_models.StudentPlacementLink).where(
+    # Crucially, delete the associated student links first to avoid foreign key errors.
+    # A single bulk DELETE avoids loading each link row just to delete it.
+    await db.exec(
+        delete(data_models.StudentPlacementLink).where(
             data_models.StudentPlacementLink.placement_id == placement_id
         )
-    ).all()
-    for link in existing_links:
-        db.delete(link)
+    )
 
-    db.delete(placement)
-    db.commit()
-    return {"message": "Placement deleted"}
+    await db.delete(placement)
+    await db.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -4,54 +4,107 @@
 #
 # - A GET endpoint is defined to count the number of placements for each employer.
 # - This endpoint requires authentication using the `get_current_user` dependency.
+# - The report is cached for a short time and sent with an `ETag`, so clients that poll it
+#   get a bodiless 304 Not Modified while the counts haven't changed.
 
+import hashlib
+import json
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select, func
+from typing_extensions import TypedDict
+from fastapi import APIRouter, Depends, Request, Response, status
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
 # Import the database session dependency
-from ..database import get_db
+from ..database import get_async_db
 # Import data models for querying
 from ..data_models import Employer, Placement
 # Import the Pydantic schema for the report's response
 from ..schemas import PlacementsPerEmployer
 # Import the authentication dependency
 from ..auth import get_current_user
+# Import the response cache decorator and settings for the report's TTL
+from ..cache import cached
+from ..config import get_settings
 
 # Initialize a new APIRouter with a prefix and tags for documentation
+settings = get_settings()
+
 router = APIRouter(
     prefix="/reports",
     tags=["reports"],
 )
 
+# The report's query, built once when the module is imported.
+# `func.count(Placement.id)` counts the number of placements.
+# `.label("placement_count")` gives the counted column a name for the response model.
+# `count` ignores the NULL placement ids of the outer join, so employers without
+# placements get 0. Grouping by the primary key keeps employers that share a
+# company name as separate rows.
+placements_per_employer_statement = select(
+    Employer.company_name,
+    func.count(Placement.id).label("placement_count")
+).outerjoin(Placement, Placement.employer_id == Employer.id).group_by(
+    Employer.id, Employer.company_name
+)
+
+class _PlacementsPerEmployerReport(TypedDict):
+    """
+    The cached form of the report: its rows together with the ETag they hash to.
+    """
+    rows: List[PlacementsPerEmployer]
+    etag: str
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Checks an `If-None-Match` header, which may list several ETags (weak or strong)
+    or be `*`, against the report's current ETag.
+    """
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+@cached("reports", _PlacementsPerEmployerReport, ttl_seconds=settings.report_cache_ttl_seconds)
+async def _placements_per_employer_report(db: AsyncSession) -> _PlacementsPerEmployerReport:
+    """
+    Computes the placements-per-employer rows together with their ETag.
+    Both are cached, so a cache hit skips the query and the hashing. Any write to
+    employers or placements clears the "reports" namespace.
+    """
+    # Execute the prebuilt statement to get the results as a list of tuples
+    results = (await db.exec(placements_per_employer_statement)).all()
+    
+    # Convert the list of tuples into the Pydantic `PlacementsPerEmployer` schema.
+    # The values come straight from the database with the right types, so
+    # `model_construct` is used to skip validating every row again.
+    rows = [
+        PlacementsPerEmployer.model_construct(company_name=company, placement_count=count)
+        for company, count in results
+    ]
+    # The ETag is a hash of the serialized rows, so it only changes when the report does.
+    payload = json.dumps([row.model_dump() for row in rows], separators=(",", ":"))
+    etag = f'"{hashlib.sha256(payload.encode()).hexdigest()[:16]}"'
+    return {"rows": rows, "etag": etag}
+
 @router.get("/placements_per_employer", response_model=List[PlacementsPerEmployer])
-def get_placements_per_employer(db: Session = Depends(get_db), current_user: str = Depends(get_current_user)):
+async def get_placements_per_employer(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: str = Depends(get_current_user)
+):
     """
     Retrieves the number of placements for each employer.
     
-    This query uses a database `JOIN` to connect `Employers` and `Placements`,
+    This query uses a database `LEFT OUTER JOIN` to connect `Employers` and `Placements`,
     then uses `GROUP BY` and a `func.count` aggregation to get the total placements
-    for each employer.
-    """
-    # Use SQLModel's select to build the query.
-    # `func.count(Placement.id)` counts the number of placements.
-    # `.label("placement_count")` gives the counted column a name for the response model.
-    statement = select(
-        Employer.company_name,
-        func.count(Placement.id).label("placement_count")
-    ).join(Placement).group_by(Employer.company_name)
-    
-    # Execute the statement to get the results as a list of tuples
-    results = db.exec(statement).all()
-    
-    if not results:
-        # Raise an HTTPException if no results are found
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="No placements found to generate report."
-        )
-    
-    # Convert the list of tuples into the Pydantic `PlacementsPerEmployer` schema
-    return [
-        PlacementsPerEmployer(company_name=company, placement_count=count)
-        for company, count in results
-    ]
+    for each employer. Employers without placements are included with a count of 0,
+    and an empty list is returned when there are no employers at all.
+    A request whose `If-None-Match` header holds the current ETag gets a 304 instead.
+    """
+    report = await _placements_per_employer_report(db=db)
+    etag = report["etag"]
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return report["rows"]
@@ -2,82 +2,147 @@
 # This file defines the API endpoints for managing student accounts.
 # It provides a complete set of RESTful routes for:
 # - Creating a new student account with password hashing.
+# - Creating many student accounts at once, for imports of whole cohorts.
 # - Retrieving a list of all students.
 # - Getting a single student by their ID.
 # - Updating a student's information, including handling password updates securely.
 # - Deleting a student account.
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+import asyncio
+from collections import Counter
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Response, status
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List
 
 # Import Pydantic schemas, data models, and authentication utilities
 from .. import schemas, data_models, auth
 # Import the database session dependency
-from ..database import get_db
+from ..database import get_async_db, update_by_id
+# Import the response cache decorator
+from ..cache import invalidates
+# Import the shared user registration helper
+from ..utils import hash_password_async, register_user
+from ..config import get_settings
+
+settings = get_settings()
 
 # Initialize a new APIRouter with a tag for grouping these endpoints in the API documentation
 router = APIRouter(tags=["Students"])
 
+# Built once at import time rather than on every request; SQLAlchemy's compiled-SQL
+# cache then reuses the same compiled statement for each call.
+# Only the columns of `StudentResponse` are selected, so the list doesn't fetch every
+# password hash or build an ORM object per student; the plain rows are validated
+# straight into the response model.
+all_students_statement = select(
+    *(getattr(data_models.Student, name) for name in schemas.StudentResponse.model_fields)
+).order_by(data_models.Student.id)
+
 @router.post("/", response_model=schemas.StudentResponse, status_code=status.HTTP_201_CREATED)
-def create_student(
+async def create_student(
     student: schemas.StudentCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Creates a new student account, ensuring the email is unique and the password is
     securely hashed before being stored in the database.
+    A duplicate email is rejected with a 409 Conflict by the shared registration helper.
+    """
+    return await register_user(
+        db, data_models.Student, student,
+        conflict_detail="Student with this email already exists"
+    )
+
+@router.post("/bulk", response_model=List[schemas.StudentResponse], status_code=status.HTTP_201_CREATED)
+async def create_students_bulk(
+    students: List[schemas.StudentCreate] = Body(max_length=settings.students_bulk_max_size),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Creates several student accounts in one request and one transaction; either every
+    student is created or, if any email is already taken, none are.
+    A request with more than STUDENTS_BULK_MAX_SIZE students is rejected with a 422.
+    The passwords are hashed in parallel, and the students and their email directory
+    entries are each written with a single multi-row INSERT.
     """
-    # Check for an existing student with the same email to prevent duplicates
-    existing_student = db.exec(
-        select(data_models.Student).where(data_models.Student.email == student.email)
-    ).first()
-    if existing_student:
-        # Raise a 409 Conflict error if the email already exists
+    if not students:
+        return []
+
+    # Reject emails repeated within the request, or already registered to any account,
+    # with one `IN` query against the email directory before any hashing is done.
+    emails = [student.email for student in students]
+    repeated = {email for email, count in Counter(emails).items() if count > 1}
+    taken = set(
+        (await db.exec(
+            select(data_models.EmailDirectory.email).where(
+                data_models.EmailDirectory.email.in_(emails)
+            )
+        )).all()
+    )
+    conflicts = sorted(repeated | taken)
+    if conflicts:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
-            detail="Student with this email already exists"
+            detail=f"Students with emails {conflicts} already exist"
         )
-    
-    # Use the utility function from the auth module to hash the plaintext password
-    hashed_password = auth.get_password_hash(student.password)
-    
-    # Create the data model object for the student, using the hashed password
-    db_student = data_models.Student(
-        full_name=student.full_name,
-        email=student.email,
-        major=student.major,
-        hashed_password=hashed_password
+
+    hashed_passwords = await asyncio.gather(
+        *(hash_password_async(student.password) for student in students)
     )
-    
+    rows = [
+        {**student.model_dump(exclude={"password"}), "hashed_password": hashed_password}
+        for student, hashed_password in zip(students, hashed_passwords)
+    ]
+
+    # A bulk INSERT skips the ORM's per-object unit of work, and with it the mapper
+    # events that normally add each new user to the email directory, so the directory
+    # rows are inserted here in the same transaction.
     try:
-        # Add the new student to the session, commit, and refresh to get the ID
-        db.add(db_student)
-        db.commit()
-        db.refresh(db_student)
-        return db_student
-    except Exception as e:
-        # Rollback the transaction on any error
-        db.rollback()
+        created = (await db.exec(
+            insert(data_models.Student).returning(
+                data_models.Student, sort_by_parameter_order=True
+            ),
+            params=rows,
+        )).scalars().all()
+        await db.exec(
+            insert(data_models.EmailDirectory),
+            params=[
+                {
+                    "email": student.email,
+                    "role": data_models.ROLES_BY_MODEL[data_models.Student],
+                    "user_id": student.id,
+                }
+                for student in created
+            ],
+        )
+        await db.commit()
+    except IntegrityError:
+        # Another request registered one of the emails after the check above.
+        await db.rollback()
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"An error occurred while creating the student: {e}"
+            status_code=status.HTTP_409_CONFLICT,
+            detail="One or more of these emails is already registered"
         )
+    return created
 
 @router.get("/", response_model=List[schemas.StudentResponse])
-def get_all_students(db: Session = Depends(get_db)):
+async def get_all_students(db: AsyncSession = Depends(get_async_db)):
     """
     Retrieves a list of all students.
     """
-    students = db.exec(select(data_models.Student)).all()
+    students = (await db.exec(all_students_statement)).all()
     return students
 
 @router.get("/{student_id}", response_model=schemas.StudentResponse)
-def get_student_by_id(student_id: int, db: Session = Depends(get_db)):
+async def get_student_by_id(student_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Retrieves a single student by their ID.
     """
-    student = db.get(data_models.Student, student_id)
+    student = await db.get(data_models.Student, student_id)
     if not student:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -86,54 +151,51 @@ def get_student_by_id(student_id: int, db: Session = Depends(get_db)):
     return student
 
 @router.patch("/{student_id}", response_model=schemas.StudentResponse)
-def update_student(
+async def update_student(
     student_id: int,
     student_update: schemas.StudentUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Updates an existing student by their ID.
     This handles partial updates and ensures the password is re-hashed if updated.
     """
-    student = db.get(data_models.Student, student_id)
-    if not student:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Student not found"
-        )
-    
     # Use Pydantic's `model_dump` with `exclude_unset=True` to get a dictionary of only
     # the fields that were provided in the request body.
     student_data = student_update.model_dump(exclude_unset=True)
     
-    # Check if a new password was provided
-    if "password" in student_data:
+    # Remove the plaintext password to prevent it from being stored
+    password = student_data.pop("password", None)
+    # Check if a new password was provided; an explicit `null` keeps the current one
+    if password is not None:
         # Hash the new password and add it to the data dictionary
-        student_data["hashed_password"] = auth.get_password_hash(student_data["password"])
-        # Remove the plaintext password to prevent it from being stored
-        del student_data["password"]
+        student_data["hashed_password"] = await auth.get_password_hash_async(password)
 
-    # Iterate through the provided data and update the student object
-    for key, value in student_data.items():
-        setattr(student, key, value)
-    
-    db.add(student)
-    db.commit()
-    db.refresh(student)
+    # Apply the update with a single UPDATE ... RETURNING statement, which also
+    # returns the updated row, so there is no separate load before or refresh after
+    student = await update_by_id(db, data_models.Student, student_id, student_data)
+    if not student:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Student not found"
+        )
+    await db.commit()
     return student
 
 @router.delete("/{student_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_student(student_id: int, db: Session = Depends(get_db)):
+# Placements list their student IDs, and evaluations reference their subject student
+@invalidates("placements", "evaluations")
+async def delete_student(student_id: int, db: AsyncSession = Depends(get_async_db)) -> Response:
     """
     Deletes a student by their ID.
     """
-    student = db.get(data_models.Student, student_id)
+    student = await db.get(data_models.Student, student_id)
     if not student:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Student not found"
         )
     
-    db.delete(student)
-    db.commit()
-    return {"message": "Student deleted"}
+    await db.delete(student)
+    await db.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
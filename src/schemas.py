@@ -8,7 +8,7 @@
 
 from datetime import date, datetime
 from typing import List, Optional
-from pydantic import ConfigDict
+from pydantic import ConfigDict, model_validator
 from sqlmodel import Field, SQLModel
 
 # --- Student Schemas ---
@@ -129,11 +129,28 @@ class EvaluationBase(SQLModel):
     mentor_evaluator_id: Optional[int] = Field(None, foreign_key="mentor.id")
     employer_evaluator_id: Optional[int] = Field(None, foreign_key="employer.id")
     student_evaluator_id: Optional[int] = Field(None, foreign_key="student.id")
-    created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class EvaluationCreate(EvaluationBase):
-    """Schema for creating a new evaluation."""
-    pass
+    """Schema for creating a new evaluation, given by exactly one evaluator."""
+
+    @model_validator(mode="after")
+    def _exactly_one_evaluator(self):
+        """
+        Ensures that only one of the three evaluator types (mentor, employer, or student)
+        is provided. Checking this while the request body is parsed means a bad request
+        is rejected with a 422 before the route runs.
+        """
+        provided = sum(
+            evaluator_id is not None
+            for evaluator_id in (
+                self.mentor_evaluator_id, self.employer_evaluator_id, self.student_evaluator_id
+            )
+        )
+        if provided == 0:
+            raise ValueError("At least one evaluator ID must be provided.")
+        if provided > 1:
+            raise ValueError("Only one type of evaluator can be provided at a time.")
+        return self
 
 class EvaluationUpdate(SQLModel):
     """Schema for updating an existing evaluation."""
@@ -141,10 +158,18 @@ class EvaluationUpdate(SQLModel):
     rating: Optional[int] = None
 
 class EvaluationResponse(EvaluationBase):
-    """Schema for an evaluation API response, includes the database ID."""
+    """Schema for an evaluation API response, includes the database ID and creation time."""
     id: int
+    created_at: datetime
     model_config = ConfigDict(from_attributes=True)
 
+# --- Report Schemas ---
+
+class PlacementsPerEmployer(SQLModel):
+    """Schema for one row of the placements-per-employer report."""
+    company_name: str
+    placement_count: int
+
 # --- Authentication Schemas ---
 
 class Token(SQLModel):
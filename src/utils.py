@@ -1,84 +1,179 @@
 # Objectives:
 # This file provides essential utility functions for security and authentication.
 # Its primary goals are:
-# 1. Secure Password Management: To safely hash and verify user passwords using bcrypt.
-# 2. JWT (JSON Web Token) Handling: To create, encode, and decode access tokens for stateless authentication.
-# 3. Dependency Injection: To define a FastAPI dependency that automatically extracts and validates a JWT from incoming requests,
-#    making it easy to protect API endpoints.
-
-from passlib.context import CryptContext
-from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
-from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
-from pydantic import BaseModel
+# 1. Secure Password Management: To safely hash and verify user passwords using Argon2id.
+#    This is the one password hashing implementation; `auth` re-exports it.
+# 2. User Registration: A single helper that creates any type of user account.
+#
+# Access tokens are created and validated by the `auth` module.
+
+from passlib.hash import sha256_crypt
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+import asyncio
+import bcrypt
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, TypeVar
+from fastapi import HTTPException, status
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 import os
-from dotenv import load_dotenv
 
-# Load environment variables from the .env file
-load_dotenv()
+from .cache import response_cache
+from .config import get_settings
+from .data_models import Employer, Mentor
 
-# Retrieve security-related variables from environment settings
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+settings = get_settings()
 
-# This context is used for securely hashing and verifying passwords.
-# bcrypt is a strong, industry-standard hashing algorithm.
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# New passwords are hashed with Argon2id, which runs in native C (argon2-cffi).
+# Two passes over 19 MiB is the OWASP-recommended minimum, and takes a fraction of
+# the CPU time of the previous 64 MiB setting; existing hashes are upgraded on login.
+# Hashes are recognised by their prefix and verified by a direct call into the
+# matching C library, without going through passlib's scheme lookup.
+# The cost comes from the settings, so it can be lowered through the environment,
+# which the test suite does so that creating accounts doesn't dominate its run time.
+argon2_hasher = PasswordHasher(
+    time_cost=settings.password_hash_time_cost,
+    memory_cost=settings.password_hash_memory_cost_kib,
+    parallelism=1,
+    hash_len=32,
+    salt_len=16,
+)
 
-# This is the authentication scheme that FastAPI uses to extract the token
-# from the "Authorization: Bearer <token>" header in a request.
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
+# passlib is only kept to verify legacy 'sha256_crypt' hashes, through its handler
+# directly rather than a CryptContext; these (and bcrypt hashes) are upgraded to
+# Argon2id the next time the user logs in.
+SHA256_CRYPT_PREFIX = "$5$"
+
+# bcrypt only looks at the first 72 bytes of a password. Older bcrypt hashes were
+# created by passlib, which silently truncated longer passwords to this length.
+BCRYPT_MAX_PASSWORD_BYTES = 72
 
-class TokenData(BaseModel):
-    """
-    A Pydantic model to represent the data stored within our JWT token payload.
-    """
-    user_id: Optional[str] = None
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verifies a plain-text password against a hashed one."""
-    return pwd_context.verify(plain_password, hashed_password)
+    """
+    Verifies a plain-text password against a hashed one.
+    """
+    if hashed_password.startswith("$argon2"):
+        try:
+            return argon2_hasher.verify(hashed_password, plain_password)
+        except (VerificationError, InvalidHashError):
+            return False
+    if hashed_password.startswith("$2"):
+        try:
+            return bcrypt.checkpw(
+                plain_password.encode()[:BCRYPT_MAX_PASSWORD_BYTES], hashed_password.encode()
+            )
+        except ValueError:
+            # The stored value looks like bcrypt but isn't a valid hash.
+            return False
+    if hashed_password.startswith(SHA256_CRYPT_PREFIX):
+        try:
+            return sha256_crypt.verify(plain_password, hashed_password)
+        except ValueError:
+            return False
+    # A hash in no known format never matches.
+    return False
 
 def get_password_hash(password: str) -> str:
-    """Hashes a password using the configured `pwd_context`."""
-    return pwd_context.hash(password)
+    """
+    Creates a secure hash of a password for storage.
+    """
+    return argon2_hasher.hash(password)
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """
+    Verifies a password and, if the stored hash uses a deprecated scheme or
+    outdated cost settings, also returns a fresh hash to store in its place.
+    The second item of the tuple is `None` when no update is needed.
+    """
+    if not verify_password(plain_password, hashed_password):
+        return False, None
+    if hashed_password.startswith("$argon2") and not argon2_hasher.check_needs_rehash(hashed_password):
+        return True, None
+    return True, get_password_hash(plain_password)
+
+# Threads that compute password hashes for `async def` routes. Argon2 and bcrypt release
+# the GIL while hashing, so up to one hash per CPU core runs in parallel while the event
+# loop keeps serving other requests. Keeping this pool separate from FastAPI's threadpool
+# means a burst of sign-ups can't take the threads that sync routes run on.
+HASH_POOL = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="password-hash")
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+async def hash_password_async(password: str) -> str:
     """
-    Creates a JWT access token.
-    The payload is encoded with a subject (`sub`) and an expiration (`exp`).
+    Async version of `get_password_hash`, computed on `HASH_POOL`.
     """
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
-def get_current_user(token: str = Depends(oauth2_scheme)):
+    return await asyncio.get_running_loop().run_in_executor(HASH_POOL, get_password_hash, password)
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
     """
-    This is a FastAPI dependency function.
-    It takes the JWT token from the request, decodes it, and validates it.
-    If the token is invalid or expired, it raises an HTTP exception.
+    Async version of `verify_and_update_password`, computed on `HASH_POOL` so that
+    several logins can be verified in parallel.
     """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
+    return await asyncio.get_running_loop().run_in_executor(
+        HASH_POOL, verify_and_update_password, plain_password, hashed_password
     )
+
+# Batch verification gets its own, smaller pool. A large batch then waits behind
+# itself instead of ahead of interactive logins on `HASH_POOL`, and at least half
+# of the cores stay free for them.
+BATCH_HASH_POOL = ThreadPoolExecutor(
+    max_workers=max(1, (os.cpu_count() or 2) // 2), thread_name_prefix="password-hash-batch"
+)
+
+def _verify_pair(pair: tuple[str, str]) -> bool:
+    return verify_password(*pair)
+
+def verify_many(pairs: list[tuple[str, str]]) -> list[bool]:
+    """
+    Verifies a batch of `(plain_password, hashed_password)` pairs, for admin tooling
+    such as auditing or migrating stored hashes. The results are in the same order as
+    `pairs`. The pairs are spread over `BATCH_HASH_POOL`, so the batch runs on several
+    cores, without the start-up and pickling cost of worker processes, and without
+    delaying logins.
+    """
+    return list(BATCH_HASH_POOL.map(_verify_pair, pairs))
+
+# A hash of a throwaway password, verified against when a login email doesn't exist.
+# This makes a failed lookup cost the same as a wrong password, so response times
+# don't reveal which emails are registered.
+DUMMY_HASH = get_password_hash("dummy-password-for-timing-equalisation")
+
+UserModel = TypeVar("UserModel", bound=SQLModel)
+
+# The cached responses that list each kind of account, cleared when a new one registers.
+# New employers also appear in the placements-per-employer report.
+REGISTRATION_CACHE_NAMESPACES = {
+    Mentor: ("mentors",),
+    Employer: ("employers", "reports"),
+}
+
+async def register_user(
+    db: AsyncSession,
+    model: type[UserModel],
+    payload: SQLModel,
+    conflict_detail: str = "Email already registered",
+) -> UserModel:
+    """
+    Creates a user account of type `model` from a `*Create` schema, storing a hash
+    of its password. Email uniqueness is enforced by the database's unique email
+    index (and the email directory), so no lookup is made before the insert; a
+    duplicate email is turned into a 409 Conflict with `conflict_detail`.
+    After a successful sign-up, the cached responses listing that kind of account
+    are cleared.
+    """
+    hashed_password = await hash_password_async(payload.password)
+    user = model(**payload.model_dump(exclude={"password"}), hashed_password=hashed_password)
+    db.add(user)
     try:
-        # Decode the JWT token to get the payload
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-        token_data = TokenData(user_id=user_id)
-    except JWTError:
-        raise credentials_exception
-    # Return the user ID from the token payload
-    return token_data.user_id
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=conflict_detail)
+    # Registration is reachable from several routers, so the cache is cleared here
+    # rather than relying on each route to do it.
+    response_cache.invalidate(*REGISTRATION_CACHE_NAMESPACES.get(model, ()))
+    # Every column but the ID comes from the payload, and the insert set the ID,
+    # so the user is returned without reloading it.
+    return user
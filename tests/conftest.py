@@ -6,6 +6,13 @@ import os
 import tempfile
 import uuid
 
+# Use the cheapest Argon2 settings in tests, where every account created would
+# otherwise pay for a production-strength hash. This must be set before `src` is imported.
+os.environ.setdefault("PASSWORD_HASH_TIME_COST", "1")
+os.environ.setdefault("PASSWORD_HASH_MEMORY_COST_KIB", "8")
+# Skip SQLite's fsync on commit; the suite's data doesn't need to survive a crash.
+os.environ.setdefault("SQLITE_UNSAFE_FAST_WRITES", "True")
+
 from src.auth import create_access_token
 from src.main import app
 from src.data_models import Student, Mentor, Employer, Placement, Evaluation, StudentPlacementLink, MentorStudentLink
@@ -72,11 +79,13 @@ def client_fixture(db_engine_and_file: tuple[any, str]) -> Generator[TestClient,
         
     app.dependency_overrides.clear()
     
-@pytest.fixture(name="auth_headers_and_ids", scope="function")
+@pytest.fixture(name="auth_headers_and_ids", scope="session")
 def auth_headers_and_ids_fixture(client: TestClient):
     """
     Fixture to create test accounts and return their IDs and auth headers.
-    This fixture is scoped to the 'function', meaning it runs for each test.
+    This fixture is scoped to the 'session', so the accounts are created once and
+    shared by every test that uses them. Tests must not delete or modify these
+    accounts; a test that needs to do so should create its own.
     """
     # Create test student with a unique email
     unique_student_email = f"naruto+{uuid.uuid4()}@konoha.com"
@@ -86,7 +95,7 @@ def auth_headers_and_ids_fixture(client: TestClient):
     response_student = client.post("/api/v1/students/", json=student_data)
     assert response_student.status_code == 201
     student_id = response_student.json()["id"]
-    student_token = create_access_token(data={"sub": unique_student_email})
+    student_token = create_access_token(unique_student_email)
     student_headers = {"Authorization": f"Bearer {student_token}"}
     
     # Create test mentor with a unique email
@@ -1,5 +1,16 @@
+import bcrypt
 import pytest
+import uuid
 from fastapi.testclient import TestClient
+from passlib.hash import sha256_crypt
+from sqlalchemy import delete, insert
+
+from src.auth import get_password_hash
+from src.cache import response_cache
+from src.config import get_settings
+from src.data_models import EmailDirectory, Student
+from src.database import create_db_and_tables, engine
+from src.utils import verify_many
 
 # --- Test Functions ---
 # NOTE: The fixtures (client, auth_headers_and_ids) are now defined in conftest.py
@@ -11,6 +22,24 @@ def test_root(client: TestClient):
     assert response.status_code == 200
     assert response.json() == {"message": "Welcome to the Internship Placement Manager API. Visit /docs for API documentation."}
 
+def test_verify_many():
+    """Tests batch verification across the current and legacy hash formats, keeping the input order."""
+    argon2_hash = get_password_hash("rasengan")
+    bcrypt_hash = bcrypt.hashpw(b"chidori", bcrypt.gensalt(rounds=4)).decode()
+    sha256_hash = sha256_crypt.using(rounds=1000).hash("sharingan")
+    pairs = [
+        ("rasengan", argon2_hash),
+        ("wrong", argon2_hash),
+        ("chidori", bcrypt_hash),
+        ("wrong", bcrypt_hash),
+        ("sharingan", sha256_hash),
+        ("wrong", sha256_hash),
+        ("rasengan", "$2b$12$not-a-real-bcrypt-hash"),
+        ("rasengan", "not-a-hash"),
+    ]
+    assert verify_many(pairs) == [True, False, True, False, True, False, False, False]
+    assert verify_many([]) == []
+
 def test_students_crud(client: TestClient):
     """Tests the POST, GET, PATCH, and DELETE functions for the students endpoint."""
     # Using unique data for this test to avoid conflicts.
@@ -26,6 +55,10 @@ def test_students_crud(client: TestClient):
     assert response.status_code == 201
     student_id = response.json()["id"]
 
+    # POST the same email again
+    response = client.post("/api/v1/students/", json=STUDENT_DATA_2)
+    assert response.status_code == 409
+
     # GET student by ID
     response = client.get(f"/api/v1/students/{student_id}")
     assert response.status_code == 200
@@ -41,6 +74,114 @@ def test_students_crud(client: TestClient):
     response = client.delete(f"/api/v1/students/{student_id}")
     assert response.status_code == 204
 
+def test_students_bulk_create(client: TestClient):
+    """Tests creating several students in one request, and that a taken email rejects the whole batch."""
+    students = [
+        {"full_name": "Rock Lee", "email": "rock.lee@konoha.com", "major": "Taijutsu", "password": "springtime"},
+        {"full_name": "Neji Hyuga", "email": "neji@konoha.com", "major": "Byakugan", "password": "destiny"},
+    ]
+    response = client.post("/api/v1/students/bulk", json=students)
+    assert response.status_code == 201
+    created = response.json()
+    assert [student["email"] for student in created] == [student["email"] for student in students]
+
+    # The new students can log in, so their email directory entries were written too
+    response = client.post(
+        "/api/v1/token", data={"username": "neji@konoha.com", "password": "destiny"}
+    )
+    assert response.status_code == 200
+
+    # One taken email rejects the whole batch
+    third = {"full_name": "Tenten", "email": "tenten@konoha.com", "major": "Weapons", "password": "scrolls"}
+    response = client.post("/api/v1/students/bulk", json=[third, students[0]])
+    assert response.status_code == 409
+    response = client.post("/api/v1/token", data={"username": "tenten@konoha.com", "password": "scrolls"})
+    assert response.status_code == 401
+
+    # A batch over the size limit is rejected before anything is hashed
+    limit = get_settings().students_bulk_max_size
+    response = client.post("/api/v1/students/bulk", json=[third] * (limit + 1))
+    assert response.status_code == 422
+
+    for student in created:
+        assert client.delete(f"/api/v1/students/{student['id']}").status_code == 204
+
+def test_login_for_access_token(client: TestClient):
+    """Tests that a registered user can log in and that bad credentials are rejected."""
+    STUDENT_DATA_3 = {
+        "full_name": "Sakura Haruno",
+        "email": f"sakura+{uuid.uuid4()}@konoha.com",
+        "major": "Medical Ninjutsu",
+        "password": "cherryblossom"
+    }
+    response = client.post("/api/v1/students/", json=STUDENT_DATA_3)
+    assert response.status_code == 201
+    student_id = response.json()["id"]
+
+    # Log in with the correct password
+    response = client.post(
+        "/api/v1/token",
+        data={"username": STUDENT_DATA_3["email"], "password": STUDENT_DATA_3["password"]}
+    )
+    assert response.status_code == 200
+    assert response.json()["token_type"] == "bearer"
+    assert response.json()["access_token"]
+
+    # Log out, after which the same token is rejected
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    response = client.post("/api/v1/logout", headers=headers)
+    assert response.status_code == 204
+    response = client.post("/api/v1/logout", headers=headers)
+    assert response.status_code == 401
+
+    # Log in with the wrong password
+    response = client.post(
+        "/api/v1/token",
+        data={"username": STUDENT_DATA_3["email"], "password": "wrongpassword"}
+    )
+    assert response.status_code == 401
+
+    # Log in with an email that is not registered
+    response = client.post(
+        "/api/v1/token",
+        data={"username": "nobody@konoha.com", "password": "wrongpassword"}
+    )
+    assert response.status_code == 401
+
+    # Clean up, so the next run can register the same student again
+    assert client.delete(f"/api/v1/students/{student_id}").status_code == 204
+
+def test_login_account_created_without_directory_entry(client: TestClient):
+    """Tests that an account written without the ORM (so without an email directory row) can log in after startup backfills the directory."""
+    email = f"hinata+{uuid.uuid4()}@konoha.com"
+    # A Core INSERT doesn't fire the mapper events that maintain the email directory
+    with engine.begin() as connection:
+        student_id = connection.execute(
+            insert(Student).values(
+                full_name="Hinata Hyuga", email=email, major="Gentle Fist",
+                hashed_password=get_password_hash("byakugan"),
+            )
+        ).inserted_primary_key[0]
+    response = client.post("/api/v1/token", data={"username": email, "password": "byakugan"})
+    assert response.status_code == 401
+
+    # Startup backfills the directory from the user tables
+    create_db_and_tables()
+    response = client.post("/api/v1/token", data={"username": email, "password": "byakugan"})
+    assert response.status_code == 200
+
+    assert client.delete(f"/api/v1/students/{student_id}").status_code == 204
+
+def test_login_directory_entry_without_account(client: TestClient):
+    """Tests that an email directory row whose account is gone is rejected with a 401, not a 500."""
+    email = f"orochimaru+{uuid.uuid4()}@sound.com"
+    with engine.begin() as connection:
+        connection.execute(insert(EmailDirectory).values(email=email, role="student", user_id=999999))
+    response = client.post("/api/v1/token", data={"username": email, "password": "immortality"})
+    assert response.status_code == 401
+    with engine.begin() as connection:
+        connection.execute(delete(EmailDirectory).where(EmailDirectory.email == email))
+
 def test_mentors_crud(client: TestClient):
     """Tests the POST, GET, PATCH, and DELETE functions for the mentors endpoint."""
     # Using unique data for this test to avoid conflicts.
@@ -54,6 +195,10 @@ def test_mentors_crud(client: TestClient):
     response = client.post("/api/v1/mentors/", json=MENTOR_DATA_2)
     assert response.status_code == 201
     mentor_id = response.json()["id"]
+
+    # POST the same email again
+    response = client.post("/api/v1/mentors/", json=MENTOR_DATA_2)
+    assert response.status_code == 409
     
     # GET mentor by ID
     response = client.get(f"/api/v1/mentors/{mentor_id}")
@@ -61,7 +206,7 @@ def test_mentors_crud(client: TestClient):
     assert response.json()["full_name"] == "Gai Sensei"
 
     # PATCH to update mentor
-    update_data = {"field": "Hidden Leaf Village Jounin"}
+    update_data = {"field": "Hidden Leaf Village Jounin", "password": None}
     response = client.patch(f"/api/v1/mentors/{mentor_id}", json=update_data)
     assert response.status_code == 200
     assert response.json()["field"] == "Hidden Leaf Village Jounin"
@@ -84,11 +229,19 @@ def test_employers_crud(client: TestClient):
     response = client.post("/api/v1/employers/", json=EMPLOYER_DATA_2)
     assert response.status_code == 201
     employer_id = response.json()["id"]
+
+    # POST the same email again
+    response = client.post("/api/v1/employers/", json=EMPLOYER_DATA_2)
+    assert response.status_code == 409
     
     # GET employer by ID
     response = client.get(f"/api/v1/employers/{employer_id}")
     assert response.status_code == 200
     assert response.json()["company_name"] == "Stark Industries"
+    # Only the response model's fields are cached, never the password hash
+    assert all(
+        "hashed_password" not in value for _, value in response_cache._entries.values()
+    )
 
     # PATCH to update employer
     update_data = {"contact_person": "Tony Stark"}
@@ -96,10 +249,38 @@ def test_employers_crud(client: TestClient):
     assert response.status_code == 200
     assert response.json()["contact_person"] == "Tony Stark"
 
+    # GET again: the cached response from before the PATCH must not be served
+    response = client.get(f"/api/v1/employers/{employer_id}")
+    assert response.json()["contact_person"] == "Tony Stark"
+
     # DELETE employer
     response = client.delete(f"/api/v1/employers/{employer_id}")
     assert response.status_code == 204
 
+def test_users_register_refreshes_cached_lists(client: TestClient):
+    """Tests that signing up through /users clears the cached mentor and employer lists."""
+    mentor = {"full_name": "Iruka Umino", "email": f"iruka+{uuid.uuid4()}@konoha.com",
+              "field": "Academy", "password": "ramen"}
+    employer = {"company_name": "Ichiraku", "email": f"teuchi+{uuid.uuid4()}@ichiraku.com",
+                "contact_person": "Teuchi", "industry": "Food", "password": "noodles"}
+
+    # Fill the caches before registering
+    mentor_count = len(client.get("/api/v1/mentors/").json())
+    employer_count = len(client.get("/api/v1/employers/").json())
+
+    response = client.post("/api/v1/users/register/mentor", json=mentor)
+    assert response.status_code == 201
+    mentor_id = response.json()["id"]
+    response = client.post("/api/v1/users/register/employer", json=employer)
+    assert response.status_code == 201
+    employer_id = response.json()["id"]
+
+    assert len(client.get("/api/v1/mentors/").json()) == mentor_count + 1
+    assert len(client.get("/api/v1/employers/").json()) == employer_count + 1
+
+    assert client.delete(f"/api/v1/mentors/{mentor_id}").status_code == 204
+    assert client.delete(f"/api/v1/employers/{employer_id}").status_code == 204
+
 def test_placement_and_evaluation_crud(client: TestClient, auth_headers_and_ids: dict):
     """
     Test the CRUD operations for placements and evaluations using the fixture.
@@ -122,6 +303,23 @@ def test_placement_and_evaluation_crud(client: TestClient, auth_headers_and_ids:
     response = client.post("/api/v1/placements/", json=placement_payload)
     assert response.status_code == 201
     placement_id = response.json()["id"]
+    assert response.json()["student_ids"] == [student_id]
+
+    # POST placement with a student that doesn't exist
+    response = client.post(
+        "/api/v1/placements/",
+        json={**placement_payload, "student_ids": [student_id, 999999]}
+    )
+    assert response.status_code == 404
+
+    # POST placement with a repeated student ID, which is linked once
+    response = client.post(
+        "/api/v1/placements/",
+        json={**placement_payload, "student_ids": [student_id, student_id]}
+    )
+    assert response.status_code == 201
+    assert response.json()["student_ids"] == [student_id]
+    assert client.delete(f"/api/v1/placements/{response.json()['id']}").status_code == 204
     
     # POST evaluation
     evaluation_payload = {
@@ -135,10 +333,24 @@ def test_placement_and_evaluation_crud(client: TestClient, auth_headers_and_ids:
     assert response.status_code == 201
     evaluation_id = response.json()["id"]
 
+    # POST evaluation with two evaluators
+    response = client.post(
+        "/api/v1/evaluations/",
+        json={**evaluation_payload, "employer_evaluator_id": employer_id}
+    )
+    assert response.status_code == 422
+
     # GET placement by ID
     response = client.get(f"/api/v1/placements/{placement_id}")
     assert response.status_code == 200
     assert response.json()["title"] == "Summer Internship"
+    assert response.json()["student_ids"] == [student_id]
+
+    # GET all placements
+    response = client.get("/api/v1/placements/")
+    assert response.status_code == 200
+    listed = {p["id"]: p for p in response.json()}
+    assert listed[placement_id]["student_ids"] == [student_id]
     
     # GET evaluation by ID
     response = client.get(f"/api/v1/evaluations/{evaluation_id}")
@@ -150,6 +362,16 @@ def test_placement_and_evaluation_crud(client: TestClient, auth_headers_and_ids:
     response = client.patch(f"/api/v1/placements/{placement_id}", json=update_payload)
     assert response.status_code == 200
     assert response.json()["status"] == "Completed"
+
+    # PATCH placement students
+    response = client.patch(f"/api/v1/placements/{placement_id}", json={"student_ids": []})
+    assert response.status_code == 200
+    assert response.json()["student_ids"] == []
+    response = client.patch(f"/api/v1/placements/{placement_id}", json={"student_ids": [student_id, 999999]})
+    assert response.status_code == 404
+    response = client.patch(f"/api/v1/placements/{placement_id}", json={"student_ids": [student_id, student_id]})
+    assert response.status_code == 200
+    assert response.json()["student_ids"] == [student_id]
     
     # PATCH evaluation
     update_payload = {"rating": 4}
@@ -164,3 +386,48 @@ def test_placement_and_evaluation_crud(client: TestClient, auth_headers_and_ids:
     # DELETE placement
     response = client.delete(f"/api/v1/placements/{placement_id}")
     assert response.status_code == 204
+
+def test_placements_per_employer_report(client: TestClient, auth_headers_and_ids: dict):
+    """Tests the report's counts and ETag: 200 with an ETag, 304 while unchanged, and a new ETag after a write."""
+    headers = auth_headers_and_ids["student_headers"]
+    url = "/api/v1/reports/placements_per_employer"
+
+    # An employer of its own, so rows left behind by other tests can't match it
+    company_name = f"Kame House {uuid.uuid4()}"
+    response = client.post("/api/v1/employers/", json={
+        "company_name": company_name, "email": f"roshi+{uuid.uuid4()}@kamehouse.com",
+        "contact_person": "Master Roshi", "industry": "Martial Arts", "password": "turtle"
+    })
+    assert response.status_code == 201
+    employer_id = response.json()["id"]
+
+    def employer_rows(report: list) -> list:
+        return [row for row in report if row["company_name"] == company_name]
+
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    # The employer has no placements yet, but is still listed
+    assert employer_rows(response.json()) == [{"company_name": company_name, "placement_count": 0}]
+
+    # The same ETag gets a bodiless 304
+    response = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    # A new placement changes the report and its ETag
+    response = client.post("/api/v1/placements/", json={
+        "title": "Intern", "description": "Report test", "start_date": "2024-01-01",
+        "end_date": "2024-06-01", "status": "Active", "student_ids": [],
+        "employer_id": employer_id,
+        "mentor_id": auth_headers_and_ids["mentor_id"],
+    })
+    assert response.status_code == 201
+    placement_id = response.json()["id"]
+    response = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert employer_rows(response.json()) == [{"company_name": company_name, "placement_count": 1}]
+
+    assert client.delete(f"/api/v1/placements/{placement_id}").status_code == 204
+    assert client.delete(f"/api/v1/employers/{employer_id}").status_code == 204